@@ -16,7 +16,10 @@ if __name__ == '__main__':
         external_stylesheets=[dbc.themes.FLATLY, dbc_css],
         external_scripts=[
             'https://cdnjs.cloudflare.com/ajax/libs/mathjax/2.7.4/MathJax.js?config=TeX-MML-AM_CHTML',
-        ]
+        ],
+        background_callback_manager=callbacks.job_manager(),
+        # Tree views, tables and histograms are created by callbacks
+        suppress_callback_exceptions=True
     )
 
     # all_figs = open_file(sys.argv[1])#('~/CMS/temp/nano_4.root',pick_objs=['Events'])
@@ -37,4 +40,4 @@ if __name__ == '__main__':
 
     callbacks.assign(app)
 
-    app.run_server(debug=True)
+    app.run(debug=True)
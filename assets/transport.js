@@ -0,0 +1,43 @@
+// Decoding of the binary/columnar payloads sent by BetterRootBrowser.graph
+// (typed_array and table_payload).
+const typedArrays = {
+    'i1': Int8Array, 'u1': Uint8Array,
+    'i2': Int16Array, 'u2': Uint16Array,
+    'i4': Int32Array, 'u4': Uint32Array,
+    'f4': Float32Array, 'f8': Float64Array
+};
+
+function decodeTypedArray(spec) {
+    if (Array.isArray(spec)) {
+        return spec;
+    }
+    const binary = atob(spec.bdata);
+    const bytes = new Uint8Array(binary.length);
+    for (let i = 0; i < binary.length; i++) {
+        bytes[i] = binary.charCodeAt(i);
+    }
+    return new typedArrays[spec.dtype](bytes.buffer);
+}
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    transport: {
+        // Columnar table payload to DataTable records and columns
+        table_records: function(payload) {
+            if (!payload) {
+                return [[], []];
+            }
+            const columns = payload.columns.map(name => decodeTypedArray(payload.data[name]));
+            const records = new Array(payload.length);
+            for (let row = 0; row < payload.length; row++) {
+                const record = {};
+                payload.columns.forEach((name, icol) => {
+                    const value = columns[icol][row];
+                    // NaN is not valid JSON, leave the cell empty like pandas records would
+                    record[name] = (typeof value === 'number' && isNaN(value)) ? null : value;
+                });
+                records[row] = record;
+            }
+            return [records, payload.columns.map(name => ({name: name, id: name}))];
+        }
+    }
+});
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+'''Benchmark of data.set_n_subentries against the original per-entry loop,
+on synthetic jagged data shaped like a NanoAOD vector branch.
+
+Usage: python benchmarks/flatten.py [n_entries] [n_subentries]
+'''
+import sys, timeit
+import numpy as np
+import awkward as ak
+from BetterRootBrowser import data
+
+def set_n_subentries_loop(array_of_entries, n_subentries, fillval=0):
+    '''Original implementation, kept here for reference.'''
+    out = np.full(
+        (len(array_of_entries), n_subentries), fillval
+    )
+    for ientry, entry in enumerate(array_of_entries):
+        for isubentry in range(n_subentries):
+            if isubentry < entry.size:
+                out[ientry][isubentry] = entry[isubentry]
+    return out
+
+def make_jagged(n_entries, mean_subentries=4, seed=42):
+    rng = np.random.default_rng(seed)
+    counts = rng.poisson(mean_subentries, n_entries)
+    content = rng.exponential(100, counts.sum()).astype(np.float32)
+    as_ak = ak.unflatten(content, counts)
+    # What uproot returns with library='np'
+    as_np = np.empty(n_entries, dtype=object)
+    as_np[:] = np.split(content, np.cumsum(counts)[:-1])
+    return as_np, as_ak
+
+def best_of(func, repeat=3):
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+if __name__ == '__main__':
+    n_entries = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    n_subentries = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    as_np, as_ak = make_jagged(n_entries)
+
+    # Same values (the loop casts to the int fill value's dtype)
+    expected = set_n_subentries_loop(as_np[:1000], n_subentries)
+    assert (data.set_n_subentries(as_np[:1000], n_subentries).astype(expected.dtype) == expected).all()
+    assert (data.set_n_subentries(as_ak[:1000], n_subentries).astype(expected.dtype) == expected).all()
+
+    results = {
+        'loop (numpy objects)': best_of(lambda: set_n_subentries_loop(as_np, n_subentries), repeat=1),
+        'vectorized (numpy objects)': best_of(lambda: data.set_n_subentries(as_np, n_subentries)),
+        'vectorized (awkward)': best_of(lambda: data.set_n_subentries(as_ak, n_subentries)),
+    }
+
+    print(f'{n_entries} entries, {n_subentries} sub-entries')
+    for name, seconds in results.items():
+        speedup = results['loop (numpy objects)']/seconds
+        print(f'{name:>28}: {seconds*1000:10.1f} ms  (x{speedup:.1f})')
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+'''Benchmark of matcher.group on synthetic file names: a few background
+samples plus a grid of signal mass points, each for three years, with
+varying numbers of tokens per name. The target is 10,000 names in under a
+second.
+
+Usage: python benchmarks/matcher.py [n_names]
+'''
+import sys, timeit
+from itertools import product
+from BetterRootBrowser import matcher
+
+def make_names(n_names):
+    samples = ['Data', 'QCD', 'TTbar', 'WJets', 'ZJets']
+    samples += [f'QCDHT{ht}' for ht in (700, 1000, 1500, 2000)]
+    samples += [f'QCDHT{ht}_htag0p8' for ht in (700, 1000, 1500, 2000)]
+    n_signal = max(0, n_names//3 - len(samples))
+    masses = product(range(300, 300 + 100*(n_signal//40 + 1), 100), range(40, 40 + 10*40, 10))
+    samples += [f'NMSSM_MX{mx}_MY{my}' for mx, my in masses][:n_signal]
+    return [f'THselection_{sample}_{year}.root' for sample in samples for year in (16, 17, 18)]
+
+if __name__ == '__main__':
+    n_names = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    names = make_names(n_names)
+
+    groups = matcher.group(names)
+    seconds = min(timeit.repeat(lambda: matcher.group(names), number=1, repeat=3))
+    sizes = sorted({len(members) for members in groups.values()})
+    print(f'{len(names)} names -> {len(groups)} groups (of {sizes} names) in {seconds*1000:.1f} ms')
+    for label in list(groups)[:3]:
+        print(f'    {label}: {groups[label]}')
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+'''Benchmark of search.ObjIndex on the names of a file with tens of
+thousands of systematic-variation histograms: building the index once,
+then one search plus the first page of results per keystroke, for every
+search mode.
+
+Usage: python benchmarks/search.py [n_names]
+'''
+import re, sys, timeit
+from BetterRootBrowser import search
+
+def make_names(n_names):
+    variations = [f'{syst}_{direction}' for syst in
+                  ['nominal', 'JES', 'JER', 'JMS', 'JMR', 'Pileup', 'PDF', 'ISR', 'FSR', 'Trigger']
+                  for direction in ('up', 'down')]
+    regions = [f'{region}_{tag}' for region in ('SR', 'CR', 'VR') for tag in ('pass', 'loose', 'fail')]
+    names = []
+    i = 0
+    while len(names) < n_names:
+        for region in regions:
+            for variation in variations:
+                names.append(f'MthvMh_particleNet_{region}__{variation}_{i}')
+        i += 1
+    return names[:n_names]
+
+if __name__ == '__main__':
+    n_names = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    names = make_names(n_names)
+    types = ['TH2F'] * len(names)
+
+    seconds = min(timeit.repeat(lambda: search.ObjIndex(names, types), number=1, repeat=3))
+    print(f'{n_names} names indexed in {seconds*1000:.1f} ms')
+
+    index = search.ObjIndex(names, types)
+    queries = {'prefix': 'MthvMh_particleNet_SR', 'substring': 'JES_up', 'regex': r'SR_pass__J[EM][SR]_up'}
+    for mode, query in queries.items():
+        def keystrokes():
+            # Every prefix of the query, as if typed one character at a time
+            # (incomplete regular expressions are errors, as in the app)
+            for n in range(1, len(query)+1):
+                try:
+                    index.page(query[:n], mode)
+                except re.error:
+                    pass
+        seconds = min(timeit.repeat(keystrokes, number=1, repeat=3)) / len(query)
+        print(f'{mode:>10}: {index.page(query, mode)[2]:6d} matches for {query!r}, {seconds*1000:.2f} ms per keystroke')
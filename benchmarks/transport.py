@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+'''Benchmark of the payloads sent to the browser: a TH2 heatmap and a table
+page, encoded as JSON lists/records (original) and as typed arrays/columnar
+payload (graph.typed_array and graph.table_payload). Sizes and times are
+those of the JSON Dash sends for the component. The heatmap is encoded with
+display rebinning (graph.max_display_bins_2d) disabled, so that only the
+encoding differs, and once more with it to show the two effects combined.
+
+Usage: python benchmarks/transport.py [n_bins] [n_rows]
+'''
+import sys, timeit
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from dash._utils import to_json
+from BetterRootBrowser import data, graph, geometry
+
+def heatmap_lists(hist_pkg):
+    '''Original figure, with every array sent as a JSON list of numbers.'''
+    z, x, y = hist_pkg['data']
+    z = np.transpose(z)
+    x, y = geometry.centers(x), geometry.centers(y)
+    return go.Figure([
+        go.Bar(x=z.sum(axis=1).tolist(), y=y.tolist(), orientation='h'),
+        go.Bar(x=x.tolist(), y=z.sum(axis=0).tolist()),
+        go.Heatmap(z=z.tolist(), x=x.tolist(), y=y.tolist()),
+    ])
+
+def heatmap_typed(hist_pkg, max_display_bins_2d):
+    '''Current figure, rebinned to at most `max_display_bins_2d` bins per axis.'''
+    default = graph.max_display_bins_2d
+    graph.max_display_bins_2d = max_display_bins_2d
+    try:
+        return graph.make_heatmap(hist_pkg).figure
+    finally:
+        graph.max_display_bins_2d = default
+
+def make_hist2d(n_bins, n_fills=10_000_000, seed=42):
+    rng = np.random.default_rng(seed)
+    counts, xedges, yedges = np.histogram2d(
+        rng.normal(0, 1, n_fills), rng.normal(0, 1, n_fills),
+        bins=n_bins, range=[[-4, 4], [-4, 4]]
+    )
+    return data.ObjPackage(name='h2', type='TH2D', data=(counts, xedges, yedges), xtitle='x', ytitle='y')
+
+def make_page(n_rows, n_cols=14, seed=42):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({f'branch_{i}': rng.exponential(100, n_rows).astype(np.float32) for i in range(n_cols-1)})
+    df['nJet'] = rng.poisson(4, n_rows)
+    df.index += 1_000_000
+    return graph.table_records(df)
+
+def measure(name, make_payload, repeat=3):
+    payload = make_payload()
+    seconds = min(timeit.repeat(lambda: to_json(make_payload()), number=1, repeat=repeat))
+    return name, len(to_json(payload)), seconds
+
+if __name__ == '__main__':
+    n_bins = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    n_rows = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+
+    hist_pkg = make_hist2d(n_bins)
+    df = make_page(n_rows)
+
+    groups = {
+        f'TH2 {n_bins}x{n_bins} bins': [
+            measure('JSON lists', lambda: heatmap_lists(hist_pkg)),
+            measure('typed arrays', lambda: heatmap_typed(hist_pkg, n_bins)),
+            measure(f'+ rebinned to {graph.max_display_bins_2d}', lambda: heatmap_typed(hist_pkg, graph.max_display_bins_2d)),
+        ],
+        f'table page {n_rows}x{len(df.columns)}': [
+            measure('records', lambda: df.to_dict('records')),
+            measure('columnar typed arrays', lambda: graph.table_payload(df)),
+        ],
+    }
+
+    for group, results in groups.items():
+        print(group)
+        _, base_size, base_seconds = results[0]
+        for name, size, seconds in results:
+            print(
+                f'{name:>24}: {size/2**20:8.2f} MB (x{base_size/size:.1f} smaller), '
+                f'{seconds*1000:8.1f} ms to build and serialize (x{base_seconds/seconds:.1f})'
+            )
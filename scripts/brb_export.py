@@ -0,0 +1,9 @@
+#!/usr/bin/env python3
+'''Export every object in ROOT files to static pages/images, see BetterRootBrowser.export.'''
+import sys, logging
+from BetterRootBrowser import export
+
+if __name__ == '__main__':
+    # data already configures logging (at WARNING)
+    logging.getLogger().setLevel(logging.INFO)
+    sys.exit(export.main())
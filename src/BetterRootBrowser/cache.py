@@ -0,0 +1,268 @@
+import os, sys, time, json, sqlite3, threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Hashable, Iterator, Tuple
+import numpy as np
+import pandas as pd
+import uproot
+import diskcache
+
+import logging
+
+def file_stamp(filepath: str) -> Tuple[int, int]:
+    '''Modification time and size of a file. Any change to either
+    invalidates everything cached from that file.'''
+    stat = os.stat(filepath)
+    return (stat.st_mtime_ns, stat.st_size)
+
+def sizeof(obj: object) -> int:
+    '''Rough estimate of the memory held by `obj` (in bytes), counting
+    numpy/pandas buffers and recursing into containers.'''
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    elif isinstance(obj, (pd.DataFrame, pd.Series)):
+        return int(np.sum(obj.memory_usage(deep=True)))
+    elif isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(sizeof(v) for v in obj.values())
+    elif isinstance(obj, (list, tuple)):
+        return sys.getsizeof(obj) + sum(sizeof(v) for v in obj)
+    return sys.getsizeof(obj)
+
+class ObjCache():
+    '''Thread-safe LRU cache of objects extracted from files, bounded by an
+    estimate of the memory they hold. Entries are keyed by (file path, key)
+    and remember the `file_stamp` of the file when they were stored, so a
+    lookup after the file changed on disk is a miss.
+
+    Results that are expensive to recompute (ie. full tree scans) can also be
+    put with `persist=True`. They are then kept in a size-bounded on-disk
+    cache in `disk_dir` as well, shared with other processes (background
+    jobs) and later sessions.
+    '''
+    def __init__(self, max_bytes: int, disk_dir: str = None, disk_max_bytes: int = 2**30) -> None:
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.disk = None
+        if disk_dir is not None:
+            self.disk = diskcache.Cache(disk_dir, size_limit=disk_max_bytes, eviction_policy='least-recently-used')
+
+    def get(self, filepath: str, key: Hashable, default: object = None) -> object:
+        stamp = file_stamp(filepath)
+        with self._lock:
+            entry = self._entries.get((filepath, key))
+            if entry is not None and entry[0] != stamp:
+                self._drop((filepath, key))
+            elif entry is not None:
+                self._entries.move_to_end((filepath, key))
+                return entry[1]
+
+        if self.disk is not None:
+            disk_entry = self.disk.get((os.path.abspath(filepath), key))
+            if disk_entry is not None and disk_entry[0] == stamp:
+                return self.put(filepath, key, disk_entry[1])
+
+        return default
+
+    def put(self, filepath: str, key: Hashable, obj: object, persist: bool = False) -> object:
+        if persist and self.disk is not None:
+            self.disk.set((os.path.abspath(filepath), key), (file_stamp(filepath), obj))
+
+        nbytes = sizeof(obj)
+        if nbytes > self.max_bytes:
+            logging.debug(f'Not caching {key} from {filepath} ({nbytes} B is over the budget of {self.max_bytes} B).')
+            return obj
+
+        stamp = file_stamp(filepath)
+        with self._lock:
+            if (filepath, key) in self._entries:
+                self._drop((filepath, key))
+
+            self._entries[(filepath, key)] = (stamp, obj, nbytes)
+            self.nbytes += nbytes
+            while self.nbytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+
+        return obj
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+        if self.disk is not None:
+            self.disk.clear()
+
+    def _drop(self, full_key: Tuple[str, Hashable]) -> None:
+        _, _, nbytes = self._entries.pop(full_key)
+        self.nbytes -= nbytes
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __repr__(self) -> str:
+        return f'ObjCache({len(self)} objects, {self.nbytes}/{self.max_bytes} B)'
+
+class FilePool():
+    '''Thread-safe pool of open uproot files so that the header and key
+    directory of a file are only parsed once rather than on every callback.
+
+    At most `max_open` idle files are kept open (least recently used are
+    closed first) and files unused for `idle_timeout` seconds are closed.
+    Files in use are never closed under a reader. Each file keeps at most
+    `object_cache_size` deserialized objects and no arrays (uproot's own
+    caches), so that `ObjCache` is the only memory tier. Use as:
+
+        with file_pool.open(filepath) as file:
+            ...
+    '''
+    def __init__(self, max_open: int = 16, idle_timeout: float = 300., object_cache_size: int = 16) -> None:
+        self.max_open = max_open
+        self.idle_timeout = idle_timeout
+        self.object_cache_size = object_cache_size
+        # filepath -> dict(file, stamp, last_used, users, retired)
+        self._handles = OrderedDict()
+        self._retired = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def open(self, filepath: str) -> Iterator[uproot.reading.ReadOnlyDirectory]:
+        handle = self._acquire(filepath)
+        try:
+            yield handle['file']
+        finally:
+            self._release(handle)
+
+    def _acquire(self, filepath: str) -> dict:
+        stamp = file_stamp(filepath)
+        with self._lock:
+            handle = self._handles.get(filepath)
+            if handle is not None and handle['stamp'] != stamp:
+                self._retire(filepath)
+                handle = None
+
+            if handle is None:
+                logging.debug(f'Opening file {filepath}')
+                file = uproot.open(filepath, object_cache=self.object_cache_size, array_cache=None)
+                handle = dict(file=file, stamp=stamp, users=0, retired=False)
+                self._handles[filepath] = handle
+
+            self._handles.move_to_end(filepath)
+            handle['users'] += 1
+            handle['last_used'] = time.monotonic()
+            self._close_idle()
+            return handle
+
+    def _release(self, handle: dict) -> None:
+        with self._lock:
+            handle['users'] -= 1
+            handle['last_used'] = time.monotonic()
+            if handle['retired'] and handle['users'] == 0:
+                self._retired.remove(handle)
+                handle['file'].close()
+
+    def _retire(self, filepath: str) -> None:
+        handle = self._handles.pop(filepath)
+        if handle['users'] == 0:
+            handle['file'].close()
+        else:
+            handle['retired'] = True
+            self._retired.append(handle)
+
+    def _close_idle(self) -> None:
+        now = time.monotonic()
+        for filepath in [f for f, h in self._handles.items() if now - h['last_used'] > self.idle_timeout]:
+            if self._handles[filepath]['users'] == 0:
+                self._retire(filepath)
+
+        idle = [f for f, h in self._handles.items() if h['users'] == 0]
+        for filepath in idle[:max(0, len(self._handles) - self.max_open)]:
+            self._retire(filepath)
+
+    def close_all(self) -> None:
+        with self._lock:
+            for filepath in list(self._handles):
+                self._retire(filepath)
+
+    def __len__(self) -> int:
+        return len(self._handles)
+
+    def __repr__(self) -> str:
+        return f'FilePool({len(self)}/{self.max_open} files open)'
+
+class DiskCatalog():
+    '''Persistent (SQLite) record of what is inside each file so that
+    reopening an unchanged file does not need to rescan it. Rows are keyed
+    by the absolute file path and only returned while the file's mtime and
+    size match the ones stored. Contents must be JSON serializable.
+    '''
+    def __init__(self, db_path: str) -> None:
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        with self._connect() as db:
+            db.execute(
+                'CREATE TABLE IF NOT EXISTS files '
+                '(path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, contents TEXT)'
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        # One short-lived connection per call keeps this safe across threads and processes
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def get(self, filepath: str) -> Dict:
+        filepath = os.path.abspath(filepath)
+        mtime_ns, size = file_stamp(filepath)
+        try:
+            with self._connect() as db:
+                row = db.execute(
+                    'SELECT contents FROM files WHERE path = ? AND mtime_ns = ? AND size = ?',
+                    (filepath, mtime_ns, size)
+                ).fetchone()
+        except sqlite3.Error as e:
+            logging.warning(f'Could not read catalog of {filepath} from {self.db_path}: {e!r}')
+            return None
+
+        return None if row is None else json.loads(row[0])
+
+    def put(self, filepath: str, contents: Dict) -> Dict:
+        filepath = os.path.abspath(filepath)
+        mtime_ns, size = file_stamp(filepath)
+        try:
+            with self._connect() as db:
+                db.execute(
+                    'INSERT OR REPLACE INTO files (path, mtime_ns, size, contents) VALUES (?, ?, ?, ?)',
+                    (filepath, mtime_ns, size, json.dumps(contents))
+                )
+        except sqlite3.Error as e:
+            logging.warning(f'Could not write catalog of {filepath} to {self.db_path}: {e!r}')
+
+        return contents
+
+    def clear(self) -> None:
+        with self._connect() as db:
+            db.execute('DELETE FROM files')
+
+    def __repr__(self) -> str:
+        return f'DiskCatalog({self.db_path})'
+
+# Directory for anything kept between sessions. Can be set with BRB_CACHE_DIR.
+cache_dir = os.path.expanduser(os.environ.get('BRB_CACHE_DIR', '~/.cache/BetterRootBrowser'))
+
+# Shared by all callbacks. Budget can be set with BRB_CACHE_MB (default 512 MB)
+# and BRB_DISK_CACHE_MB for persisted results (default 1024 MB).
+obj_cache = ObjCache(
+    max_bytes=int(os.environ.get('BRB_CACHE_MB', 512))*2**20,
+    disk_dir=os.path.join(cache_dir, 'objects'),
+    disk_max_bytes=int(os.environ.get('BRB_DISK_CACHE_MB', 1024))*2**20
+)
+
+# Shared by all callbacks. Limits can be set with BRB_MAX_OPEN_FILES (default 16),
+# BRB_FILE_IDLE_TIMEOUT (seconds, default 300) and BRB_FILE_OBJECT_CACHE
+# (objects kept by each open file, default 16).
+file_pool = FilePool(
+    max_open=int(os.environ.get('BRB_MAX_OPEN_FILES', 16)),
+    idle_timeout=float(os.environ.get('BRB_FILE_IDLE_TIMEOUT', 300)),
+    object_cache_size=int(os.environ.get('BRB_FILE_OBJECT_CACHE', 16))
+)
+
+disk_catalog = DiskCatalog(os.path.join(cache_dir, 'catalog.sqlite'))
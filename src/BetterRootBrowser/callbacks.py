@@ -2,8 +2,9 @@ import logging, dash
 from tokenize import group
 from dash.dependencies import Input, Output, State, ALL, MATCH
 import dash_bootstrap_components as dbc
-import os, json
-from BetterRootBrowser import data, graph, page
+import os, re, json, diskcache
+from BetterRootBrowser import data, graph, page, merge, search
+from BetterRootBrowser.cache import cache_dir
 import numpy as np
 import pandas as pd
 from glob import glob
@@ -44,7 +45,7 @@ def unpack_file_paths(file_path_str):
             if len(globbed_paths) == 0:
                 missing.append(abs_path)
             else:
-                found.extend(globbed_paths)
+                found.extend(sorted(globbed_paths))
 
     return found, missing
 
@@ -67,6 +68,15 @@ def NumpyPandasSerialize(obj):
 
     raise TypeError('Unknown type:', type(obj))
 
+def job_manager():
+    # Background callbacks (file scans, branch histograms) are queued on disk
+    # and run in their own process, so they never block a server worker
+    return dash.DiskcacheManager(diskcache.Cache(os.path.join(cache_dir, 'jobs')))
+
+def report_progress(set_progress, unit):
+    # Adapts the (done, total) progress of data/scan functions to a dbc.Progress
+    return lambda done, total: set_progress((done, max(total, 1), f'{done}/{total} {unit}'))
+
 def assign(app):
     # On open button press, grab file path, set valid + invalid flags, set open message
     @app.callback(
@@ -80,23 +90,48 @@ def assign(app):
             Output('file-open-msg', 'children'),
             Output('file-open-msg', 'className'),
             Output('file-paths', 'data')
-        ])
-    def check_for_file_on_button_click(click_flag, file_path, file_open_msg_class):
+        ],
+        background=True,
+        progress=[
+            Output('file-scan-progress', 'value'),
+            Output('file-scan-progress', 'max'),
+            Output('file-scan-progress', 'label')
+        ],
+        running=[
+            (Output('file-open-button', 'disabled'), True, False),
+            (Output('file-scan-progress', 'style'), {'visibility': 'visible'}, {'visibility': 'hidden'})
+        ],
+        prevent_initial_call=True
+    )
+    def check_for_file_on_button_click(set_progress, click_flag, file_path, file_open_msg_class):
         valid, invalid, msg, msg_class = False, False, '', file_open_msg_class
         if click_flag == 0:
             return [], msg, msg_class, ''
 
         found_files, missing_files = unpack_file_paths(file_path)
-        if len(found_files) > 0:
+        # Files of the same dataset (differing only by ie. the year) share one catalog scan
+        groups = data.file_groups(found_files)
+        files_info = data.get_files_info(
+            found_files, progress=report_progress(set_progress, 'files'), groups=list(groups.values())
+        )
+        unreadable_files = [f for f, info in zip(found_files, files_info) if isinstance(info, Exception)]
+
+        if len(found_files) > len(unreadable_files):
             valid = True
             file_titles = ', '.join(f.split('/')[-1] for f in found_files)
             success_msg = f"Successfully opened all files!"
 
-        if len(missing_files) > 0:
+        if len(missing_files) > 0 or len(unreadable_files) > 0:
             invalid = True
-            file_titles = ', '.join(f.split('/')[-1] for f in missing_files)
-            fail_msg = f"Error: Could not open {file_titles}!"
-            print('Not able to find file paths:\n\t%s'%",\n\t".join(missing_files))
+            fail_msgs = []
+            if len(missing_files) > 0:
+                file_titles = ', '.join(f.split('/')[-1] for f in missing_files)
+                fail_msgs.append(f"Error: Could not open {file_titles}!")
+                print('Not able to find file paths:\n\t%s'%",\n\t".join(missing_files))
+            if len(unreadable_files) > 0:
+                file_titles = ', '.join(f.split('/')[-1] for f in unreadable_files)
+                fail_msgs.append(f"Error: Could not read {file_titles}!")
+            fail_msg = ' '.join(fail_msgs)
 
         if invalid:
             msg = fail_msg
@@ -108,10 +143,21 @@ def assign(app):
             msg = ''
             msg_class = file_open_msg_class
         
-        file_accordion_items = []
+        file_items = {}
         file_paths = {}
-        for ifile, file_name in enumerate(found_files):
-            open_file = data.get_file_info(file_name)
+        for ifile, (file_name, open_file) in enumerate(zip(found_files, files_info)):
+            if isinstance(open_file, Exception):
+                continue
+
+            # Too many objects to send them all to the browser, search them instead
+            if len(open_file) > search.max_listed_objects:
+                file_items[file_name] = page.file_accordion_item(
+                    page.obj_search_panel(ifile, file_name, len(open_file), search.modes),
+                    file_name.split('/')[-1], ifile
+                )
+                file_paths[f'file-{ifile}'] = file_name
+                continue
+
             grouped_names = {}
             for obj_name, obj in open_file.items():
                 if obj['type'] not in grouped_names.keys():
@@ -135,36 +181,406 @@ def assign(app):
                 type_accordion_items, ifile
             )
 
+            file_items[file_name] = page.file_accordion_item(type_accordion, file_name.split('/')[-1], ifile)
+            file_paths[f'file-{ifile}'] = file_name
+
+        # One nested accordion per group of files, unless there is only one group
+        file_accordion_items = []
+        for igroup, (group_name, members) in enumerate(groups.items()):
+            items = [file_items[f] for f in members if f in file_items]
+            if len(items) > 1 and len(groups) > 1:
+                file_accordion_items.append(page.group_accordion_item(
+                    page.file_accordion(items, igroup), group_name.split('/')[-1], len(items), igroup
+                ))
+            else:
+                file_accordion_items.extend(items)
+
+        # Same-named trees across files can also be browsed as one chain
+        chains = data.chainable_trees({
+            f: info for f, info in zip(found_files, files_info) if not isinstance(info, Exception)
+        })
+        if len(chains) > 0:
+            chain_radio = page.obj_radio_template(
+                'file-chain-type-TTree-radio',
+                [ {'label': f'{n} ({len(chains[n])} files)', 'value':n} for n in sorted(chains) ]
+            )
             file_accordion_items.append(
-                page.file_accordion_item(type_accordion, file_name.split('/')[-1], ifile)
+                page.file_accordion_item(
+                    page.type_accordion([page.type_accordion_item(chain_radio, 'TTree', 'chain')], 'chain'),
+                    'All files (chain)', 'chain'
+                )
             )
-
-            file_paths[f'file-{ifile}'] = file_name
+            file_paths['file-chain'] = chains
 
         file_accordion = page.file_accordion(file_accordion_items)
 
         return file_accordion, msg, msg_class, json.dumps(file_paths)#, json.dumps(data_loaded, default=NumpyPandasSerialize)
 
+    def show_obj(file_id, obj_selected, data_to_display, file_paths):
+        out = [dash.html.H5(obj_selected)]
+        # 1D histograms that are in other opened files too can be compared across them
+        if file_id != 'file-chain' and graph.display_kind(data_to_display) in ('1D', 'points') \
+                and not data_to_display['type'].startswith('TGraph'):
+            all_files = [path for key, path in file_paths.items() if key != 'file-chain']
+            files_with_obj = data.files_with_object(all_files, obj_selected)
+            if len(files_with_obj) > 1:
+                out.append(graph.make_compare_controls(obj_selected, files_with_obj))
+
+        out.append(graph.make_display(data_to_display))
+        return out
+
     @app.callback(
         inputs=dict(
             objs = Input({'id': ALL, 'type': 'obj-radio'}, 'value'),
-            file_id = State('file-list', 'active_item'),
             file_paths = State('file-paths', 'data')
         ),
-        output=Output('loaded-content', 'children'),
+        output=[
+            Output('loaded-content', 'children'),
+            Output('obj-request', 'data')
+        ],
         prevent_initial_call=True,
         # suppress_callback_exceptions=True
     )
-    def display_obj(objs, file_id, file_paths):
+    def display_obj(objs, file_paths):
         if not any(objs):
-            return []
+            return [], dash.no_update
 
-        file_paths = json.loads(file_paths)
+        # Radios are `file-<i>-type-<type>-radio`, at any depth of the (grouped) file accordion
+        file_id = get_id_of_trigger().split('-type-')[0]
         obj_selected = dash.callback_context.triggered[0]['value']
-        data_to_display = data.extract_from_file(file_paths[file_id], obj_selected)
 
-        out = [
-            dash.html.H5(obj_selected),
-            graph.make_display(data_to_display)
+        # Objects read before are shown right away, anything else is read by load_obj
+        data_to_display = None
+        if file_id != 'file-chain':
+            data_to_display = data.extract_from_file(json.loads(file_paths)[file_id], obj_selected, compute=False)
+        if data_to_display is None:
+            return page.obj_placeholder(obj_selected), {'file_id': file_id, 'obj': obj_selected, 'file_paths': file_paths}
+
+        return show_obj(file_id, obj_selected, data_to_display, json.loads(file_paths)), dash.no_update
+
+    # Reading an object for the first time (ie. a large TH3 on a slow file
+    # system, or the trees of a chain) runs as a job, cancelled when another
+    # object is picked. The result is kept on disk for the server to reuse
+    @app.callback(
+        inputs=dict(
+            request = Input('obj-request', 'data')
+        ),
+        output=Output('loaded-content', 'children', allow_duplicate=True),
+        background=True,
+        cancel=[Input('loaded-content', 'children')],
+        prevent_initial_call=True
+    )
+    def load_obj(request):
+        file_id, obj_selected = request['file_id'], request['obj']
+        file_paths = json.loads(request['file_paths'])
+        if file_id == 'file-chain':
+            data_to_display = data.extract_chain(file_paths[file_id][obj_selected], obj_selected)
+        else:
+            data_to_display = data.extract_from_file(file_paths[file_id], obj_selected, persist=True)
+
+        return show_obj(file_id, obj_selected, data_to_display, file_paths)
+
+    @app.callback(
+        inputs=dict(
+            n_clicks = Input('compare-button', 'n_clicks'),
+            filepaths = State('compare-files', 'value'),
+            obj_name = State('compare-source', 'data')
+        ),
+        output=Output('compare-area', 'children'),
+        prevent_initial_call=True
+    )
+    def compare_histograms(n_clicks, filepaths, obj_name):
+        if not filepaths or len(filepaths) < 2:
+            return 'Select at least two files to compare.'
+
+        # All files are read at once, the first selected one is the ratio reference
+        pkgs = data.extract_many(filepaths, obj_name)
+        extracted = [(f, pkg) for f, pkg in zip(filepaths, pkgs) if not isinstance(pkg, Exception)]
+        if len(extracted) < 2:
+            return f'Could not read {obj_name} from enough files to compare.'
+
+        labels = graph.file_labels([f for f, _ in extracted])
+        try:
+            return graph.make_overlay([pkg for _, pkg in extracted], labels)
+        except ValueError as e:
+            return str(e)
+
+    @app.callback(
+        inputs=dict(
+            n_clicks = Input('merge-button', 'n_clicks'),
+            filepaths = State('compare-files', 'value'),
+            obj_name = State('compare-source', 'data')
+        ),
+        output=Output('merge-area', 'children'),
+        background=True,
+        progress=[
+            Output('merge-progress', 'value'),
+            Output('merge-progress', 'max'),
+            Output('merge-progress', 'label')
+        ],
+        running=[
+            (Output('merge-button', 'disabled'), True, False),
+            (Output('merge-progress', 'style'), {'visibility': 'visible'}, {'visibility': 'hidden'})
+        ],
+        cancel=[Input('loaded-content', 'children')],
+        prevent_initial_call=True
+    )
+    def merge_histograms(set_progress, n_clicks, filepaths, obj_name):
+        if not filepaths:
+            return 'Select the files to sum.'
+
+        try:
+            merged = merge.merged_histogram(filepaths, obj_name, progress=report_progress(set_progress, 'files'))
+        except (KeyError, ValueError) as e:
+            logging.warning(f'Could not merge {obj_name}: {e!r}')
+            return str(e)
+
+        return [dash.html.H5(merged['name']), graph.make_display(merged)]
+
+    @app.callback(
+        inputs=dict(
+            active_tab = Input('tree-tabs', 'active_tab'),
+            built = State('tree-data', 'children'),
+            source = State('table-source', 'data')
+        ),
+        output=Output('tree-data', 'children'),
+        prevent_initial_call=True
+    )
+    def show_tree_data(active_tab, built, source):
+        if active_tab != 'data' or built:
+            return dash.no_update
+
+        tree = data.open_tree(source['filepaths'], source['name'])
+        return graph.make_tree_data(tree)
+
+    # Cuts (a scan of the whole tree) and sorting (a read of a whole branch)
+    # run as a job. Their results are cached (on disk too), then page_table
+    # only reads the entries of each page
+    @app.callback(
+        inputs=dict(
+            sort_by = Input('table', 'sort_by'),
+            cut = Input('tree-cut', 'value'),
+            source = State('table-source', 'data')
+        ),
+        output=[
+            Output('table-ready', 'data'),
+            Output('tree-cut', 'invalid')
+        ],
+        background=True,
+        progress=[
+            Output('table-progress', 'value'),
+            Output('table-progress', 'max'),
+            Output('table-progress', 'label')
+        ],
+        running=[
+            (Output('table-progress', 'style'), {'display': 'flex'}, {'display': 'none'})
+        ],
+        cancel=[Input('loaded-content', 'children')],
+        prevent_initial_call=True
+    )
+    def prepare_table(set_progress, sort_by, cut, source):
+        tree = data.open_tree(source['filepaths'], source['name'])
+        try:
+            selection = data.select_entries(tree, cut, progress=report_progress(set_progress, 'entries'))
+        except Exception as e:
+            logging.warning(f'Could not apply cut "{cut}": {e!r}')
+            return dash.no_update, True
+
+        if sort_by and sort_by[0]['column_id'] != 'entry':
+            data.sort_order(tree, sort_by[0]['column_id'], sort_by[0]['direction'] == 'asc')
+
+        n_entries = tree.num_entries if selection is None else len(selection)
+        return {'cut': cut, 'sort_by': sort_by or [], 'count': n_entries}, False
+
+    @app.callback(
+        inputs=dict(
+            page_current = Input('table', 'page_current'),
+            page_size = Input('table', 'page_size'),
+            branches = Input('table-columns', 'value'),
+            ready = Input('table-ready', 'data'),
+            source = State('table-source', 'data')
+        ),
+        output=[
+            Output('table-payload', 'data'),
+            Output('table', 'page_count')
+        ],
+        prevent_initial_call=True
+    )
+    def page_table(page_current, page_size, branches, ready, source):
+        # Selection and sort order come from the cache, filled by prepare_table
+        tree = data.open_tree(source['filepaths'], source['name'])
+        selection = data.select_entries(tree, ready['cut'])
+
+        page_count = max(1, int(np.ceil(ready['count']/page_size)))
+        if not branches:
+            return graph.table_payload(pd.DataFrame()), page_count
+
+        df = graph.table_records(tree.page(page_current, page_size, branches, ready['sort_by'], selection))
+        return graph.table_payload(df), page_count
+
+    # Decoded in the browser (assets/transport.js)
+    app.clientside_callback(
+        dash.ClientsideFunction(namespace='transport', function_name='table_records'),
+        Output('table', 'data'),
+        Output('table', 'columns'),
+        Input('table-payload', 'data')
+    )
+
+    @app.callback(
+        inputs=dict(
+            relayout = Input({'type': 'hist-graph', 'index': MATCH}, 'relayoutData'),
+            view = State({'type': 'hist-view', 'index': MATCH}, 'data'),
+            source = State({'type': 'hist-source', 'index': MATCH}, 'data')
+        ),
+        output=[
+            Output({'type': 'hist-graph', 'index': MATCH}, 'figure'),
+            Output({'type': 'hist-view', 'index': MATCH}, 'data')
+        ],
+        prevent_initial_call=True
+    )
+    def zoom_histogram(relayout, view, source):
+        # Re-bin the full resolution histogram for the zoomed window. Sums and
+        # branch histograms are only taken from the cache (where the job that
+        # made them left them), never recomputed here
+        new_view = graph.zoom_view(relayout or {}, view)
+        if new_view == view:
+            return dash.no_update, dash.no_update
+
+        hist_pkg = data.extract_source(source, compute=False)
+        if hist_pkg is None:
+            logging.info(f'Not re-binning {source}, it is no longer cached.')
+            return dash.no_update, dash.no_update
+        return graph.figure_for(hist_pkg, new_view), new_view
+
+    @app.callback(
+        inputs=dict(
+            mode = Input({'type': 'volume-mode', 'index': MATCH}, 'value'),
+            axis = Input({'type': 'volume-axis', 'index': MATCH}, 'value'),
+            ibin = Input({'type': 'volume-bin', 'index': MATCH}, 'value'),
+            source = State({'type': 'volume-source', 'index': MATCH}, 'data')
+        ),
+        output=[
+            Output({'type': 'volume-graph', 'index': MATCH}, 'figure'),
+            Output({'type': 'volume-bin', 'index': MATCH}, 'max'),
+            Output({'type': 'volume-bin', 'index': MATCH}, 'disabled')
+        ],
+        prevent_initial_call=True
+    )
+    def show_volume(mode, axis, ibin, source):
+        # Slice or projection of a 3D histogram, computed here rather than in the browser
+        hist_pkg = data.extract_source(source)
+        n_bins = len(hist_pkg['data']['xyz'.index(axis)+1]) - 1
+        return graph.figure_volume(hist_pkg, axis, mode, ibin or 0), n_bins-1, mode != 'slice'
+
+    @app.callback(
+        inputs=dict(
+            active_cell = Input('table', 'active_cell'),
+            source = State('table-source', 'data')
+        ),
+        output=Output('hist-branch', 'value'),
+        prevent_initial_call=True
+    )
+    def pick_branch_from_table(active_cell, source):
+        if active_cell is None or active_cell['column_id'] == 'entry':
+            return dash.no_update
+
+        tree = data.open_tree(source['filepaths'], source['name'])
+        branch, _ = tree.branch_of(active_cell['column_id'])
+        return branch
+
+    @app.callback(
+        inputs=dict(
+            branch = Input('hist-branch', 'value'),
+            bins = Input('hist-bins', 'value'),
+            cut = Input('tree-cut', 'value'),
+            source = State('table-source', 'data')
+        ),
+        output=Output('branch-hist', 'children'),
+        background=True,
+        progress=[
+            Output('hist-progress', 'value'),
+            Output('hist-progress', 'max'),
+            Output('hist-progress', 'label')
+        ],
+        running=[
+            (Output('hist-progress', 'style'), {'visibility': 'visible'}, {'visibility': 'hidden'})
+        ],
+        # Displaying another object cancels the job
+        cancel=[Input('loaded-content', 'children')],
+        prevent_initial_call=True
+    )
+    def histogram_branch(set_progress, branch, bins, cut, source):
+        if not branch or not bins:
+            return []
+
+        tree = data.open_tree(source['filepaths'], source['name'])
+        try:
+            hist_pkg = data.histogram_branch(tree, branch, int(bins), cut=cut, progress=report_progress(set_progress, 'entries'))
+        except Exception as e:
+            logging.warning(f'Could not histogram {branch}: {e!r}')
+            return f'Could not histogram branch {branch}.'
+
+        return graph.make_display(hist_pkg)
+
+    @app.callback(
+        inputs=dict(
+            n_clicks = Input('summary-button', 'n_clicks'),
+            source = State('table-source', 'data')
+        ),
+        output=Output('tree-summary', 'children'),
+        background=True,
+        progress=[
+            Output('summary-progress', 'value'),
+            Output('summary-progress', 'max'),
+            Output('summary-progress', 'label')
+        ],
+        running=[
+            (Output('summary-button', 'disabled'), True, False),
+            (Output('summary-progress', 'style'), {'visibility': 'visible'}, {'visibility': 'hidden'})
+        ],
+        cancel=[Input('loaded-content', 'children')],
+        prevent_initial_call=True
+    )
+    def summarize_tree(set_progress, n_clicks, source):
+        tree = data.open_tree(source['filepaths'], source['name'])
+        try:
+            df = data.summarize_tree(tree, progress=report_progress(set_progress, 'entries'))
+        except Exception as e:
+            logging.warning(f'Could not summarize {tree}: {e!r}')
+            return f'Could not compute statistics of {tree.name}.'
+
+        return graph.make_tree_summary(df)
+
+    # Files listed with a search box (see page.obj_search_panel) only get the
+    # matching objects of the current page, answered from the server-side index
+    @app.callback(
+        inputs=dict(
+            query = Input({'id': MATCH, 'type': 'obj-search'}, 'value'),
+            mode = Input({'id': MATCH, 'type': 'obj-search-mode'}, 'value'),
+            active_page = Input({'id': MATCH, 'type': 'obj-search-page'}, 'active_page'),
+            filepath = State({'id': MATCH, 'type': 'obj-search-file'}, 'data')
+        ),
+        output=[
+            Output({'id': MATCH, 'type': 'obj-radio'}, 'options'),
+            Output({'id': MATCH, 'type': 'obj-search-page'}, 'max_value'),
+            Output({'id': MATCH, 'type': 'obj-search-page'}, 'active_page'),
+            Output({'id': MATCH, 'type': 'obj-search-msg'}, 'children')
+        ]
+    )
+    def search_objects(query, mode, active_page, filepath):
+        # A new query or mode starts back from the first page
+        if 'obj-search-page' not in dash.callback_context.triggered[0]['prop_id']:
+            active_page = 1
+
+        index = search.obj_index(filepath)
+        try:
+            names, types, nfound = index.page(query or '', mode, active_page or 1)
+        except re.error as e:
+            return dash.no_update, dash.no_update, dash.no_update, f'Invalid regular expression: {e}'
+
+        options = [
+            {'label': [name, dash.html.Small(f' {obj_type}', className='text-muted')], 'value': name}
+            for name, obj_type in zip(names, types)
         ]
-        return out 
\ No newline at end of file
+        npages = max(1, -(-nfound // search.page_size))
+        return options, npages, active_page, f'{nfound} of {len(index)} objects'
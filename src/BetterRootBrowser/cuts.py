@@ -0,0 +1,127 @@
+import ast, re
+from typing import Dict, List
+import numpy as np
+from numpy.typing import NDArray
+import awkward as ak
+
+def at(array: ak.Array, index: int) -> ak.Array:
+    '''`index`-th sub-entry of every entry of a jagged branch, NaN if the
+    entry does not have that many sub-entries (so any comparison is False).'''
+    if index < 0:
+        raise ValueError('Negative sub-entry indices are not supported in cuts.')
+    return ak.fill_none(ak.pad_none(array, index+1, axis=1)[:, index], np.nan)
+
+# Functions that can be used in cut expressions
+functions = {
+    'abs': np.abs, 'fabs': np.abs,
+    'sqrt': np.sqrt, 'exp': np.exp, 'log': np.log, 'log10': np.log10,
+    'sin': np.sin, 'cos': np.cos, 'tan': np.tan,
+    'atan2': np.arctan2, 'pow': np.power,
+    'min': np.minimum, 'max': np.maximum,
+}
+
+def translate(expression: str) -> str:
+    '''C++/ROOT style operators to python ones.'''
+    expression = expression.replace('&&', ' and ').replace('||', ' or ')
+    expression = re.sub(r'!(?!=)', ' not ', expression)
+    expression = re.sub(r'\btrue\b', 'True', expression)
+    expression = re.sub(r'\bfalse\b', 'False', expression)
+    return expression.strip()
+
+class _Vectorize(ast.NodeTransformer):
+    '''Rewrite a parsed expression so it evaluates on whole arrays at once.
+    Boolean operators become bitwise ones on operands converted to bool
+    (`x != 0`, like C++ does for `&&`, `||` and `!`), chained comparisons are split,
+    `branch[i]` becomes `at(branch, i)` and every name is checked.'''
+    def __init__(self, branches: List[str]) -> None:
+        self.branches = branches
+        self.used_branches = set()
+
+    @staticmethod
+    def _compare_zero(node: ast.AST, op: ast.cmpop) -> ast.AST:
+        # Without this, ie. `2 & True` is 0 and `~0` is -1 (truthy)
+        return ast.Compare(left=node, ops=[op], comparators=[ast.Constant(value=0)])
+
+    def visit_BoolOp(self, node: ast.BoolOp) -> ast.AST:
+        op = ast.BitAnd() if isinstance(node.op, ast.And) else ast.BitOr()
+        values = [self._compare_zero(self.visit(v), ast.NotEq()) for v in node.values]
+        out = values[0]
+        for value in values[1:]:
+            out = ast.BinOp(left=out, op=op, right=value)
+        return out
+
+    def visit_UnaryOp(self, node: ast.UnaryOp) -> ast.AST:
+        if isinstance(node.op, ast.Not):
+            return self._compare_zero(self.visit(node.operand), ast.Eq())
+        return self.generic_visit(node)
+
+    def visit_Compare(self, node: ast.Compare) -> ast.AST:
+        operands = [self.visit(node.left)] + [self.visit(c) for c in node.comparators]
+        pairs = [
+            ast.Compare(left=operands[i], ops=[op], comparators=[operands[i+1]])
+            for i, op in enumerate(node.ops)
+        ]
+        out = pairs[0]
+        for pair in pairs[1:]:
+            out = ast.BinOp(left=out, op=ast.BitAnd(), right=pair)
+        return out
+
+    def visit_Subscript(self, node: ast.Subscript) -> ast.AST:
+        index = node.slice
+        if not (isinstance(index, ast.Constant) and isinstance(index.value, int)):
+            raise SyntaxError('Only constant integer indices (ie. "Jet_pt[0]") are supported in cuts.')
+        return ast.Call(func=ast.Name(id='at', ctx=ast.Load()), args=[self.visit(node.value), index], keywords=[])
+
+    def visit_Call(self, node: ast.Call) -> ast.AST:
+        if not (isinstance(node.func, ast.Name) and node.func.id in functions) or node.keywords:
+            raise SyntaxError(f'Unsupported function call in cut. Available functions are {list(functions)}.')
+        return ast.Call(func=node.func, args=[self.visit(a) for a in node.args], keywords=[])
+
+    def visit_Name(self, node: ast.Name) -> ast.AST:
+        if node.id in self.branches:
+            self.used_branches.add(node.id)
+        elif node.id not in functions:
+            raise NameError(f'"{node.id}" is not a branch of the tree.')
+        return node
+
+    def generic_visit(self, node: ast.AST) -> ast.AST:
+        allowed = (ast.Expression, ast.BinOp, ast.UnaryOp, ast.Constant, ast.Load,
+                   ast.operator, ast.unaryop, ast.cmpop)
+        if not isinstance(node, allowed):
+            raise SyntaxError(f'Unsupported syntax in cut: {type(node).__name__}.')
+        return super().generic_visit(node)
+
+class Cut():
+    '''Selection on the entries of a tree, written like in ROOT
+    (ie. `nJet > 2 && Jet_pt[0] > 200`). The expression is parsed and
+    compiled once and then evaluated on whole chunks of the branches it
+    references (`self.branches`).
+
+    An expression on a jagged branch without an index (ie. `Jet_pt > 200`)
+    selects entries where any sub-entry passes.
+    '''
+    def __init__(self, expression: str, branches: List[str]) -> None:
+        self.expression = expression
+        vectorizer = _Vectorize(branches)
+        tree = vectorizer.visit(ast.parse(translate(expression), mode='eval'))
+        self.code = compile(ast.fix_missing_locations(tree), f'<cut {expression}>', 'eval')
+        self.branches = sorted(vectorizer.used_branches)
+
+    def __reduce__(self):
+        # Compiled code can not be pickled (ie. to send to scan processes), so recompile instead
+        return (Cut, (self.expression, self.branches))
+
+    def __call__(self, chunk: Dict[str, ak.Array]) -> NDArray:
+        '''Boolean mask of the entries of `chunk` passing the cut.'''
+        namespace = dict(functions, at=at)
+        namespace.update({b: chunk[b] for b in self.branches})
+        mask = eval(self.code, {'__builtins__': {}}, namespace)
+
+        if np.isscalar(mask):
+            return np.full(len(next(iter(chunk.values()))), bool(mask))
+        if isinstance(mask, ak.Array) and mask.ndim > 1:
+            mask = ak.any(mask, axis=-1)
+        return np.asarray(ak.to_numpy(ak.fill_none(mask, False)), dtype=bool)
+
+    def __repr__(self) -> str:
+        return f'Cut({self.expression})'
@@ -1,8 +1,13 @@
-import uproot
-from typing import Dict, List, Union
+import uproot, os
+import awkward as ak
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Tuple, Union
 import numpy as np
 from numpy.typing import NDArray
 import pandas as pd
+from BetterRootBrowser import scan, geometry, matcher
+from BetterRootBrowser.cuts import Cut
+from BetterRootBrowser.cache import obj_cache, file_pool, disk_catalog, file_stamp
 from pprint import PrettyPrinter
 pp = PrettyPrinter(indent=4)
 
@@ -11,6 +16,9 @@ uprootfile = uproot.reading.ReadOnlyDirectory
 import logging
 logging.basicConfig(level=logging.WARNING, format='%(levelname)s:  %(message)s')
 
+# Removes anything from edm namespace (CMSSW)
+edm_filter = lambda b: 'edm::' not in b.typename#'/^.(?!(edm\:\:))$/'
+
 def to_str(obj):
     lines = []
 
@@ -27,12 +35,21 @@ def to_str(obj):
         elif isinstance(v, pd.DataFrame):
             df_str = '\n\t\t'.join(v.to_string(max_rows=5, max_cols=6).split('\n'))
             lines.append(f'{k} = '+'\n\t\t'+f'{df_str}')
+        elif isinstance(v, LazyTree): # includes ChainTree
+            lines.append(f'{k} = {v}')
+        elif isinstance(v, (int, float)):
+            lines.append(f'{k} = {v}')
+        elif isinstance(v, list):
+            lines.append(f'{k} = {v[:5]}' + (f' (+{len(v)-5} more)' if len(v) > 5 else ''))
 
     return ',\n\t'.join(lines)
 
 class ObjPackage(dict):
+    # Class attribute, so it already exists when unpickling (ie. from the
+    # disk cache) calls __setitem__ before the instance __dict__ is restored
+    _allowed_keys = ["name", "type", "data", "xtitle", "ytitle", "fig", "cycle", "dims", "entries", "branches", "source", "geometry", "errors", "ztitle"]
+
     def __init__(self, **kwargs):
-        self._allowed_keys = ["name", "type", "data", "xtitle", "ytitle", "fig"]
         if len(kwargs) > 0:
             for k,v in kwargs.items():
                 self[k] = v
@@ -48,29 +65,77 @@ class ObjPackage(dict):
     def __repr__(self) -> str:
         return "ObjPackage(\n\t{}\n)".format(to_str(self))
 
-def set_n_subentries(array_of_entries: NDArray, n_subentries: int, fillval: object=0) -> NDArray:
-    '''Create a numpy array of zeros of the size of the input.
-    Fill in indices for which there is a value, leaving out 
-    any values that are out of index range.
+def jagged_layout(array_of_entries: Union[NDArray, ak.Array]) -> Tuple[NDArray, NDArray]:
+    '''Split an array of variable length sub-arrays into the number of
+    sub-entries per entry (counts) and all sub-entries concatenated (content).
 
     Args:
-        array_of_entries (NDArray): [description]
-        n_subentries (int): [description]
+        array_of_entries (Union[NDArray, ak.Array]): Jagged awkward array, numpy object
+            array of numpy arrays, or regular 2D numpy array.
 
     Returns:
-        NDArray: [description]
+        Tuple[NDArray, NDArray]: counts and content. The content of vectors of
+            vectors stays an awkward array of the inner vectors.
     '''
-    out = np.full(
-        (len(array_of_entries), n_subentries), fillval
-    )
-    for ientry, entry in enumerate(array_of_entries):
-        for isubentry in range(n_subentries):
-            if isubentry < entry.size:
-                out[ientry][isubentry] = entry[isubentry]
+    if isinstance(array_of_entries, ak.Array):
+        counts = ak.to_numpy(ak.num(array_of_entries, axis=1))
+        content = ak.flatten(array_of_entries, axis=1)
+        if content.ndim == 1:
+            content = ak.to_numpy(content)
+
+    elif array_of_entries.dtype != object:
+        # Fixed size sub-arrays (ie. `float[3]`) are already regular
+        content = array_of_entries.reshape(len(array_of_entries), -1)
+        counts = np.full(len(content), content.shape[1], dtype=np.int64)
+        content = content.reshape(-1)
+
+    else:
+        counts = np.fromiter(map(len, array_of_entries), dtype=np.int64, count=len(array_of_entries))
+        content = np.concatenate(array_of_entries) if counts.sum() > 0 else np.empty(0)
+
+    return counts, content
+
+def set_n_subentries(array_of_entries: Union[NDArray, ak.Array], n_subentries: int, fillval: object=0) -> NDArray:
+    '''Pad (with `fillval`) or clip every entry to exactly `n_subentries`
+    sub-entries. Works on the counts/offsets of the jagged array so the
+    padding and clipping happen in bulk, without looping over entries.
+    Sub-entries that are vectors themselves (awkward vectors of vectors) are
+    clipped first, so only the kept ones are turned into python lists.
+
+    Args:
+        array_of_entries (Union[NDArray, ak.Array]): Array of variable length sub-arrays.
+        n_subentries (int): Number of sub-entries (columns) to keep.
+        fillval (object, optional): Value for missing sub-entries. Defaults to 0.
+
+    Returns:
+        NDArray: 2D array of shape (number of entries, n_subentries).
+    '''
+    if isinstance(array_of_entries, ak.Array) and array_of_entries.ndim > 2:
+        cells = ak.flatten(ak.pad_none(array_of_entries, n_subentries, axis=1, clip=True), axis=1)
+        out = np.fromiter((fillval if cell is None else cell for cell in cells.to_list()),
+                          dtype=object, count=len(cells))
+        return out.reshape(-1, n_subentries)
+
+    counts, content = jagged_layout(array_of_entries)
+    offsets = np.zeros(len(counts)+1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+
+    dtype = object if content.dtype == object else np.result_type(content.dtype, fillval)
+    out = np.full((len(counts), n_subentries), fillval, dtype=dtype)
+
+    # Row and column of every sub-entry that survives the clipping
+    kept = np.minimum(counts, n_subentries)
+    rows = np.repeat(np.arange(len(counts)), kept)
+    kept_offsets = np.repeat(np.cumsum(kept) - kept, kept)
+    cols = np.arange(len(rows)) - kept_offsets
+
+    out[rows, cols] = content[np.repeat(offsets[:-1], kept) + cols]
     return out
 
-def get_flat_df(tree: uproot.models.TTree, n_subentries: int = 5) -> pd.DataFrame:
-    '''Efficient unpacking of TTree into dict of numpy arrays. Since the arrays are
+def get_flat_df(tree: uproot.models.TTree, n_subentries: int = 5,
+                entry_start: int = None, entry_stop: int = None,
+                branches: List[str] = None) -> pd.DataFrame:
+    '''Efficient unpacking of TTree into dict of awkward arrays. Since the arrays are
     of dim 1, storing sub-arrays of variable length, the sub-arrays must be
     set to a static number of subentries. The resulting 2D numpy array is fed into
     pandas. 
@@ -79,30 +144,37 @@ def get_flat_df(tree: uproot.models.TTree, n_subentries: int = 5) -> pd.DataFram
     - Using just `tree.arrays(library='pd', how='left')` unpacks a 22 MB file into a 2.2 GB DataFrame in memory!
     - This algorithmic unpacking returns a 70 MB DataFrame from the same 22 MB file.
 
+    Only the baskets overlapping `[entry_start, entry_stop)` of the requested
+    branches are read so that a window of a large tree stays cheap.
+
     Args:
         tree (uproot.models.TTree): [description]
         n_subentries (int, optional): [description]. Defaults to 5.
+        entry_start (int, optional): First entry to read. Defaults to None (start of tree).
+        entry_stop (int, optional): Entry to stop before. Defaults to None (end of tree).
+        branches (List[str], optional): Names of branches to read. Defaults to None (all non-edm branches).
 
     Returns:
         pd.DataFrame: [description]
     '''
     # Uproot magic - keys are branch names, values are array of arrays
     # where the sub arrays are of variable length.
-    # Removes anything from edm namespace (CMSSW)
-    edm_filter = lambda b: 'edm::' not in b.typename#'/^.(?!(edm\:\:))$/'
-
     if len(tree.keys(filter_branch=edm_filter)) == 0:
         return 'Cound not open TTree due to unsupported branches in edm namespace.'
 
-    tree_dict = tree.arrays(library='np', filter_branch=edm_filter) 
+    name_filter = None if branches is None else (lambda name: name in branches)
+    tree_dict = tree.arrays(
+        library='ak', how=dict, filter_branch=edm_filter, filter_name=name_filter,
+        entry_start=entry_start, entry_stop=entry_stop
+    )
 
     # Unstack TTree into Series (non-vector branches) and DataFrames (vector branches)
     all_columns = []
     for branch_name, branch_entries in tree_dict.items():
-        has_many = not np.isscalar(branch_entries[0])
+        has_many = branch_entries.ndim > 1
 
         if not has_many:
-            all_columns.append(pd.Series(branch_entries, name=branch_name))
+            all_columns.append(pd.Series(ak.to_numpy(branch_entries), name=branch_name))
 
         else:
             all_columns.append(
@@ -112,75 +184,779 @@ def get_flat_df(tree: uproot.models.TTree, n_subentries: int = 5) -> pd.DataFram
                 )
             )
 
+    if len(all_columns) == 0:
+        return pd.DataFrame()
+
     df = pd.concat(all_columns, axis=1)
+    if entry_start:
+        df.index += entry_start
 
     return df
 
-def supported_obj_keys(file: uprootfile, pick_objs: List[str] = []) -> List[str]:
+class LazyTree():
+    '''Light-weight stand-in for a TTree that only stores its metadata.
+    Data is read window by window with `window()`, reopening the file each
+    time, so that only the entries and branches on display are ever in memory.
+    '''
+    def __init__(self, filepath: str, name: str, n_subentries: int = 5,
+                 num_entries: int = None, branches: List[str] = None) -> None:
+        self.filepath = filepath
+        self.name = name
+        self.n_subentries = n_subentries
+        self.num_entries = num_entries
+        self.branches = branches
+
+        # Metadata is only read if not already known (ie. from the file catalog)
+        if num_entries is None or branches is None:
+            with file_pool.open(filepath) as file:
+                tree = file[name]
+                self.num_entries = tree.num_entries
+                self.branches = tree.keys(filter_branch=edm_filter)
+
+    @property
+    def filepaths(self) -> List[str]:
+        return [self.filepath]
+
+    def cache_key(self, *parts) -> Tuple:
+        '''Key for `obj_cache` (along with `self.filepath`) of something derived
+        from this tree. Other files of a chain are part of the key.'''
+        other_files = tuple((f, file_stamp(f)) for f in self.filepaths[1:])
+        return (self.name, *parts, self.n_subentries, other_files)
+
+    def window(self, entry_start: int = 0, entry_stop: int = None, branches: List[str] = None) -> pd.DataFrame:
+        '''Read entries `[entry_start, entry_stop)` of `branches` (all by default)
+        into a flat DataFrame indexed by entry number.'''
+        if entry_stop is None or entry_stop > self.num_entries:
+            entry_stop = self.num_entries
+        entry_start = max(0, min(entry_start, entry_stop))
+
+        with file_pool.open(self.filepath) as file:
+            return get_flat_df(file[self.name], self.n_subentries, entry_start, entry_stop, branches)
+
+    def rows(self, entries: NDArray, branches: List[str] = None) -> pd.DataFrame:
+        '''Read an arbitrary set of entries, in the order given. Consecutive
+        entries are grouped into runs so that each run is a single windowed read.'''
+        entries = np.asarray(entries, dtype=np.int64)
+        if entries.size == 0:
+            return self.window(0, 0, branches)
+
+        unique_entries = np.unique(entries)
+        breaks = np.flatnonzero(np.diff(unique_entries) != 1) + 1
+
+        with file_pool.open(self.filepath) as file:
+            tree = file[self.name]
+            frames = [
+                get_flat_df(tree, self.n_subentries, run[0], run[-1]+1, branches)
+                for run in np.split(unique_entries, breaks)
+            ]
+
+        if isinstance(frames[0], str):
+            return frames[0]
+        return pd.concat(frames).loc[entries]
+
+    def branch_of(self, column: str) -> Tuple[str, int]:
+        '''Map a flat DataFrame column name back to its branch and
+        sub-entry index (None for non-vector branches).'''
+        if column in self.branches:
+            return column, None
+
+        branch, _, isubentry = column.rpartition('_')
+        if branch not in self.branches or not isubentry.isdigit():
+            raise KeyError(f'Column "{column}" does not belong to any branch of {self.name}.')
+        return branch, int(isubentry)
+
+    def page(self, page_current: int, page_size: int, branches: List[str] = None,
+             sort_by: List[Dict] = [], selection: NDArray = None) -> pd.DataFrame:
+        '''Read one page of the tree, as requested by a `dash_table.DataTable`
+        with `page_action='custom'` and `sort_action='custom'`. Unsorted pages
+        only read their own entry range. Sorted pages read the sort column once
+        (see `sort_order`) and then only the entries of the page. If `selection`
+        (entries passing a cut, see `select_entries`) is given, only those
+        entries are paged through.'''
+        n_entries = self.num_entries if selection is None else len(selection)
+        start = max(0, page_current*page_size)
+        stop = min(start+page_size, n_entries)
+
+        column, ascending = 'entry', True
+        if len(sort_by) > 0:
+            column, ascending = sort_by[0]['column_id'], sort_by[0]['direction'] == 'asc'
+
+        if column == 'entry':
+            if selection is not None:
+                entries = (selection if ascending else selection[::-1])[start:stop]
+            elif ascending:
+                return self.window(start, stop, branches)
+            else:
+                entries = np.arange(n_entries-1-start, n_entries-1-stop, -1)
+        else:
+            order = sort_order(self, column, ascending)
+            if selection is not None:
+                order = order[np.isin(order, selection, assume_unique=True)]
+            entries = order[start:stop]
+
+        return self.rows(entries, branches)
+
+    def overview(self) -> pd.DataFrame:
+        '''Per-branch storage summary (see `branch_overview`), sorted by compressed size.
+        Only branch metadata is read, no basket is decompressed. Cached until the file changes.'''
+        cache_key = self.cache_key('overview')
+        df = obj_cache.get(self.filepath, cache_key)
+        if df is None:
+            df = obj_cache.put(self.filepath, cache_key, sum_overviews(
+                [branch_overview(f, self.name, self.branches) for f in self.filepaths]
+            ))
+        return df
+
+    def __len__(self) -> int:
+        return self.num_entries
+
+    def __repr__(self) -> str:
+        return f'LazyTree({self.filepath}:{self.name}, {self.num_entries} entries, {len(self.branches)} branches)'
+
+class ChainTree(LazyTree):
+    '''Same-named TTrees of several files viewed as one tree (like a TChain).
+    Global entry numbers are mapped to (file, local entry) with the cumulative
+    entry counts of the files and only the files overlapping the requested
+    entries are read. Only branches present in every file are available.
+    '''
+    def __init__(self, filepaths: List[str], name: str, n_subentries: int = 5) -> None:
+        self.name = name
+        self.n_subentries = n_subentries
+        self.trees = []
+        for filepath in filepaths:
+            info = get_file_info(filepath).get(name, {})
+            self.trees.append(LazyTree(
+                filepath, name, n_subentries,
+                num_entries=info.get('entries', None), branches=info.get('branches', None)
+            ))
+
+        self.filepath = filepaths[0]
+        self.offsets = np.zeros(len(self.trees)+1, dtype=np.int64)
+        np.cumsum([t.num_entries for t in self.trees], out=self.offsets[1:])
+        self.num_entries = int(self.offsets[-1])
+        self.branches = [b for b in self.trees[0].branches if all(b in t.branches for t in self.trees[1:])]
+
+    @property
+    def filepaths(self) -> List[str]:
+        return [t.filepath for t in self.trees]
+
+    def locate(self, entries: NDArray) -> Tuple[NDArray, NDArray]:
+        '''Index of the file and local entry number of global `entries`.'''
+        entries = np.asarray(entries, dtype=np.int64)
+        ifile = np.searchsorted(self.offsets, entries, side='right') - 1
+        return ifile, entries - self.offsets[ifile]
+
+    def window(self, entry_start: int = 0, entry_stop: int = None, branches: List[str] = None) -> pd.DataFrame:
+        if entry_stop is None or entry_stop > self.num_entries:
+            entry_stop = self.num_entries
+        entry_start = max(0, min(entry_start, entry_stop))
+        branches = self.branches if branches is None else branches
+
+        frames = []
+        for ifile, tree in enumerate(self.trees):
+            start = max(entry_start, self.offsets[ifile])
+            stop = min(entry_stop, self.offsets[ifile+1])
+            if start < stop:
+                frames.append(self._shift(tree.window(start-self.offsets[ifile], stop-self.offsets[ifile], branches), ifile))
+
+        if len(frames) == 0:
+            return self.trees[0].window(0, 0, branches)
+        return self._concat(frames)
+
+    def rows(self, entries: NDArray, branches: List[str] = None) -> pd.DataFrame:
+        entries = np.asarray(entries, dtype=np.int64)
+        branches = self.branches if branches is None else branches
+        if entries.size == 0:
+            return self.trees[0].window(0, 0, branches)
+
+        ifiles, local_entries = self.locate(entries)
+        frames = [
+            self._shift(self.trees[ifile].rows(local_entries[ifiles == ifile], branches), ifile)
+            for ifile in np.unique(ifiles)
+        ]
+        df = self._concat(frames)
+        return df if isinstance(df, str) else df.loc[entries]
+
+    def _shift(self, df: pd.DataFrame, ifile: int) -> pd.DataFrame:
+        # Local to global entry numbers
+        if not isinstance(df, str):
+            df.index += self.offsets[ifile]
+        return df
+
+    def _concat(self, frames: List[pd.DataFrame]) -> pd.DataFrame:
+        if isinstance(frames[0], str):
+            return frames[0]
+        return pd.concat(frames)
+
+    def __repr__(self) -> str:
+        return f'ChainTree({len(self.trees)} files:{self.name}, {self.num_entries} entries, {len(self.branches)} branches)'
+
+def branch_overview(filepath: str, tree_name: str, branches: List[str]) -> pd.DataFrame:
+    '''Type, compressed and uncompressed size and number of baskets of each branch,
+    all from the TBranch metadata (nothing is decompressed).'''
+    with file_pool.open(filepath) as file:
+        tree = file[tree_name]
+        rows = []
+        for branch_name in branches:
+            branch = tree[branch_name]
+            rows.append({
+                'branch': branch_name,
+                'type': branch.typename,
+                'compressed bytes': branch.compressed_bytes,
+                'uncompressed bytes': branch.uncompressed_bytes,
+                'baskets': branch.num_baskets
+            })
+    return pd.DataFrame(rows, columns=['branch', 'type', 'compressed bytes', 'uncompressed bytes', 'baskets'])
+
+def sum_overviews(overviews: List[pd.DataFrame]) -> pd.DataFrame:
+    '''Add up the `branch_overview`s of the same tree in several files
+    and sort branches by compressed size.'''
+    df = pd.concat(overviews).groupby('branch', sort=False).agg({
+        'type': 'first', 'compressed bytes': 'sum', 'uncompressed bytes': 'sum', 'baskets': 'sum'
+    }).reset_index()
+
+    df['compression ratio'] = (df['uncompressed bytes']/df['compressed bytes'].where(df['compressed bytes'] > 0)).round(2)
+    return df.sort_values('compressed bytes', ascending=False, kind='stable').reset_index(drop=True)
+
+def open_tree(filepaths: Union[str, List[str]], name: str, n_subentries: int = 5) -> LazyTree:
+    '''LazyTree of one file or ChainTree of several.'''
+    if isinstance(filepaths, str):
+        return LazyTree(filepaths, name, n_subentries)
+    elif len(filepaths) == 1:
+        return LazyTree(filepaths[0], name, n_subentries)
+    return ChainTree(filepaths, name, n_subentries)
+
+def sort_order(tree: LazyTree, column: str, ascending: bool = True) -> NDArray:
+    '''Entry numbers of a tree sorted by one flat column. Only the branch
+    holding that column is read and the result is cached since every page
+    of a sorted table needs it.'''
+    cache_key = tree.cache_key('sort_order', column, ascending)
+    order = obj_cache.get(tree.filepath, cache_key)
+    if order is not None:
+        return order
+
+    branch, _ = tree.branch_of(column)
+    values = tree.window(branches=[branch])[column].to_numpy()
+
+    order = np.argsort(values, kind='stable')
+    if not ascending:
+        order = order[::-1]
+    return obj_cache.put(tree.filepath, cache_key, order, persist=True)
+
+def make_cut(tree: LazyTree, expression: str) -> Cut:
+    '''Compile a cut expression on the branches of `tree`, None if the expression is empty.'''
+    if expression is None or expression.strip() == '':
+        return None
+    return Cut(expression, tree.branches)
+
+def select_entries(tree: LazyTree, expression: str, progress: Callable[[int, int], None] = None) -> NDArray:
+    '''Entry numbers of a (possibly chained) tree passing a cut (see `cuts.Cut`),
+    evaluated chunk by chunk (see `scan.select_entries`) and cached per cut.
+    None if the expression is empty.'''
+    cut = make_cut(tree, expression)
+    if cut is None:
+        return None
+
+    cache_key = tree.cache_key('selection', cut.expression)
+    selection = obj_cache.get(tree.filepath, cache_key)
+    if selection is None:
+        selection = obj_cache.put(tree.filepath, cache_key,
+            scan.select_entries(tree.filepaths, tree.name, cut, tree.branches[0], progress),
+            persist=True
+        )
+    return selection
+
+def histogram_branch(tree: LazyTree, branch: str, bins: int = 50, range: Tuple[float, float] = None,
+                     cut: str = None, progress: Callable[[int, int], None] = None,
+                     compute: bool = True) -> ObjPackage:
+    '''Histogram of one branch of a (possibly chained) tree, streamed chunk by
+    chunk (see `scan.histogram`) and cached per tree, branch, binning and cut.
+    With `compute=False`, only a cached histogram is returned (None if there is none).'''
+    cut = make_cut(tree, cut)
+    cache_key = tree.cache_key('histogram', branch, bins, range, None if cut is None else cut.expression)
+    pkg = obj_cache.get(tree.filepath, cache_key)
+    if pkg is None and not compute:
+        return None
+    elif pkg is None:
+        counts, edges = scan.histogram(tree.filepaths, tree.name, branch, bins, range, cut, progress)
+        pkg = obj_cache.put(tree.filepath, cache_key, ObjPackage(
+            name = f'{tree.name}-{branch}',
+            data = (counts, edges),
+            geometry = geometry.describe(counts, [edges]),
+            xtitle = branch if cut is None else f'{branch} ({cut.expression})',
+            ytitle = 'Entries',
+            type = 'TH1D',
+            source = {'filepaths': tree.filepaths, 'tree': tree.name, 'branch': branch,
+                      'bins': bins, 'range': range, 'cut': None if cut is None else cut.expression}
+        ), persist=True)
+    return pkg
+
+def extract_source(source: Dict, compute: bool = True) -> ObjPackage:
+    '''Package again from the `source` it was made from, ie. to redraw it at
+    a different resolution. Comes from the object cache unless evicted.
+    With `compute=False`, sums over files and branch histograms (which need
+    full scans) are only returned if cached, None otherwise.'''
+    if 'merged' in source:
+        # merge builds on this module
+        from BetterRootBrowser.merge import merged_histogram
+        return merged_histogram(source['merged'], source['name'], compute=compute)
+    elif 'branch' in source:
+        tree = open_tree(source['filepaths'], source['tree'])
+        return histogram_branch(tree, source['branch'], source['bins'], source['range'], source['cut'], compute=compute)
+    return extract_from_file(source['filepath'], source['name'])
+
+def summarize_tree(tree: LazyTree, progress: Callable[[int, int], None] = None) -> pd.DataFrame:
+    '''Per-branch statistics of a (possibly chained) tree: entries, number of
+    values, mean, std, min, max, NaN/inf counts and, for jagged branches, the
+    multiplicity (sub-entries per entry) distribution. Computed in one streaming
+    pass (see `scan.summarize`) and cached until any of the files change.'''
+    cache_key = tree.cache_key('summary')
+    df = obj_cache.get(tree.filepath, cache_key)
+    if df is not None:
+        return df
+
+    stats = scan.summarize(tree.filepaths, tree.name, tree.branches, progress)
+    rows = []
+    for branch in tree.branches:
+        s = stats.get(branch)
+        if s is None:
+            continue
+        multiplicity = s['multiplicity']
+        rows.append({
+            'branch': branch,
+            'entries': s['entries'],
+            'values': s['values'],
+            'mean': s['mean'] if s['n'] else np.nan,
+            'std': np.sqrt(s['m2']/s['n']) if s['n'] else np.nan,
+            'min': s['min'] if s['n'] else np.nan,
+            'max': s['max'] if s['n'] else np.nan,
+            'NaN': s['nan'],
+            'inf': s['inf'],
+            'mean multiplicity': np.nan if multiplicity is None else s['values']/max(s['entries'], 1),
+            'multiplicity': '' if multiplicity is None else ' '.join(
+                f'{m}:{c}' for m, c in enumerate(multiplicity) if c
+            ),
+        })
+
+    return obj_cache.put(tree.filepath, cache_key, pd.DataFrame(rows), persist=True)
+
+# Class name prefixes that can be displayed
+supported_classes = ['TH', 'TProfile', 'TGraph', 'TEfficiency', 'TTree']
+# Matching the prefixes above but not readable (yet)
+unsupported_classes = ['THStack', 'TGraph2D', 'TGraphMultiErrors', 'TGraphBentErrors', 'TGraphPolar', 'TGraphTime']
+
+def is_histogram(classname: str) -> bool:
+    '''Binned classes read by `read_histogram`. Profiles hold a mean (and
+    TEfficiency a ratio) per bin rather than counts, see `is_additive`.'''
+    return classname.startswith(('TH', 'TProfile', 'TEfficiency'))
+
+def is_additive(classname: str) -> bool:
+    '''Whether bin contents can be summed, ie. when merging bins.'''
+    return not classname.startswith(('TProfile', 'TEfficiency'))
+
+def build_catalog(file: uprootfile) -> Dict[str, Dict]:
+    '''Index every object in the file, recursing into TDirectories, in one
+    pass over the keys. Only the highest cycle of each object is kept.
+
+    Args:
+        file (uprootfile): Open file.
+
+    Returns:
+        Dict[str, Dict]: Path of the object in the file (ie. `dir/subdir/hist`, no cycle)
+            to a dict with its `path`, `classname` and `cycle`.
+    '''
+    catalog = {}
+    for key, classname in file.classnames(recursive=True).items():
+        path, _, cycle = key.rpartition(';')
+        cycle = int(cycle)
+        if path not in catalog or catalog[path]['cycle'] < cycle:
+            catalog[path] = dict(path=path, classname=classname, cycle=cycle)
+    return catalog
+
+def file_catalog(filepath: str) -> Dict[str, Dict]:
+    '''`build_catalog` for a file path, cached until the file changes.'''
+    catalog = obj_cache.get(filepath, ('catalog',))
+    if catalog is None:
+        with file_pool.open(filepath) as file:
+            catalog = obj_cache.put(filepath, ('catalog',), build_catalog(file))
+    return catalog
+
+def supported_obj_keys(file: uprootfile, pick_objs: List[str] = [], catalog: Dict[str, Dict] = None) -> List[str]:
     # NOTE: Currently only supporting histograms
+    if catalog is None:
+        catalog = build_catalog(file)
+
     unsupported = []
     out = []
-    for obj_name in [k.split(';')[0] for k in file.keys()]:
-        class_match = [file.classname_of(obj_name).startswith(classname) for classname in ['TH','TTree']]
+    for obj_name, entry in catalog.items():
+        class_match = [entry['classname'].startswith(classname) for classname in supported_classes]
 
         if (pick_objs != []) and (obj_name not in pick_objs):
             continue
-        elif any(class_match):
+        elif entry['classname'].startswith('TDirectory'):
+            # Contents are already in the catalog
+            continue
+        elif any(class_match) and not entry['classname'].startswith(tuple(unsupported_classes)):
             out.append(obj_name)
         else:
-            unsupported.append(file.classname_of(obj_name))
+            unsupported.append(entry['classname'])
             continue            
 
     if len(unsupported) > 0:
-        logging.warning(f'Only histograms and TTrees are currently supported. Objects of other types will be skipped (found {unsupported}).')
+        logging.warning(f'Only histograms, profiles, graphs, efficiencies and TTrees are currently supported. Objects of other types will be skipped (found {unsupported}).')
 
     return out 
 
-def extract_from_file(filepath: str, obj_name: List[str] = []) -> Dict[str, ObjPackage]:
-    file = uproot.open(filepath)
-    
-    if file.classname_of(obj_name).startswith('TH'):
-        pkg = ObjPackage(
-            name = obj_name,
-            data = file[obj_name].to_numpy(),
-            xtitle = file[obj_name].member('fXaxis').member('fTitle'),
-            ytitle = file[obj_name].member('fYaxis').member('fTitle'),
-            type = file.classname_of(obj_name)
-        )
+def extract_from_file(filepath: str, obj_name: str, compute: bool = True, persist: bool = False) -> ObjPackage:
+    '''Extract `obj_name` from the file, reusing the result from the
+    object cache if the file has not changed since it was last extracted.
+    With `compute=False`, only a cached result is returned (None if there is
+    none). With `persist=True`, a new result is also kept on disk, ie. when
+    extracted by a job for the server to reuse.'''
+    pkg = obj_cache.get(filepath, obj_name)
+    if pkg is None and compute:
+        pkg = obj_cache.put(filepath, obj_name, read_from_file(filepath, obj_name), persist=persist)
+    return pkg
 
-    elif file.classname_of(obj_name).startswith('TTree'):
-        pkg = ObjPackage(
-            name = obj_name,
-            data = get_flat_df(file[obj_name]),
-            type = file.classname_of(obj_name)
-        )
-    
+def read_from_file(filepath: str, obj_name: str) -> ObjPackage:
+    classname = file_catalog(filepath)[obj_name]['classname']
+    with file_pool.open(filepath) as file:
+
+        if classname.startswith('TTree'):
+            tree = LazyTree(filepath, obj_name)
+            if len(tree.branches) == 0:
+                tree = 'Cound not open TTree due to unsupported branches in edm namespace.'
+
+            return ObjPackage(
+                name = obj_name,
+                data = tree,
+                type = classname
+            )
+
+        elif classname.startswith('TEfficiency'):
+            pkg = read_efficiency(file[obj_name])
+
+        elif is_histogram(classname):
+            pkg = read_histogram(file[obj_name])
+
+        elif classname.startswith('TGraph'):
+            pkg = read_graph(file[obj_name])
+
+        else:
+            raise RuntimeError(f'Not able to extract object {obj_name} from {filepath}')
+
+    pkg['name'] = obj_name
+    pkg['type'] = classname
+    pkg['source'] = {'filepath': filepath, 'name': obj_name}
+    return pkg
+
+def axis_titles(obj: object) -> Dict[str, str]:
+    titles = {}
+    for axis in ['x', 'y', 'z']:
+        if obj.has_member(f'f{axis.upper()}axis'):
+            titles[f'{axis}title'] = obj.member(f'f{axis.upper()}axis').member('fTitle')
+    return titles
+
+def read_histogram(obj: object) -> ObjPackage:
+    '''Bin contents (means for profiles) and edges of a TH1/2/3 or TProfile/2D/3D,
+    with their errors and geometry (see `geometry.describe`).'''
+    values = obj.values()
+    edges = [axis.edges() for axis in obj.axes]
+    errors = obj.errors()
+    pkg = ObjPackage(data = (values, *edges), errors = {'y': (errors, errors)}, **axis_titles(obj))
+
+    if is_additive(obj.classname):
+        pkg['geometry'] = geometry.describe(values, edges, obj.values(flow=True))
     else:
-        raise RuntimeError(f'Not able to extract object {obj_name} from {filepath}')
+        pkg['geometry'] = geometry.describe(values, edges)
+    return pkg
 
-    file.close()
+def graph_axis_titles(obj: object) -> Dict[str, str]:
+    '''Axis titles of a TGraph: those of its `fHistogram` if it has one, else
+    the ones in its title ("title;x title;y title", as in ROOT).'''
+    histogram = obj.member('fHistogram') if obj.has_member('fHistogram') else None
+    if histogram is not None:
+        titles = axis_titles(histogram)
+        return {'xtitle': titles.get('xtitle', ''), 'ytitle': titles.get('ytitle', '')}
+
+    title, *axes = obj.member('fTitle').split(';')
+    if axes:
+        return {'xtitle': axes[0], 'ytitle': axes[1] if len(axes) > 1 else ''}
+    return {'xtitle': title, 'ytitle': ''}
+
+def read_graph(obj: object) -> ObjPackage:
+    '''Points of a TGraph and, if it has them, their (possibly asymmetric) errors.'''
+    x, y = obj.values('both')
+    pkg = ObjPackage(data = (x, y), **graph_axis_titles(obj))
+    if obj.has_member('fEXlow'):
+        pkg['errors'] = {
+            'x': (obj.errors('low', 'x'), obj.errors('high', 'x')),
+            'y': (obj.errors('low', 'y'), obj.errors('high', 'y')),
+        }
+    elif obj.has_member('fEX'):
+        ex, ey = np.asarray(obj.member('fEX')), np.asarray(obj.member('fEY'))
+        pkg['errors'] = {'x': (ex, ex), 'y': (ey, ey)}
     return pkg
 
-def get_file_info(filepath: str) -> uproot.reading.ReadOnlyDirectory:
-    logging.debug(f'Opening file {filepath}')
-    file = uproot.open(filepath)
+def read_efficiency(obj: object) -> ObjPackage:
+    '''Efficiency (passed/total) per bin of a TEfficiency, with Wilson score
+    interval errors (see `wilson_interval`). Bins with no total entries are NaN.'''
+    passed, total = obj.member('fPassedHistogram'), obj.member('fTotalHistogram')
+    edges = [axis.edges() for axis in total.axes]
+    efficiency, low, high = wilson_interval(passed.values(), total.values())
+    return ObjPackage(
+        data = (efficiency, *edges),
+        errors = {'y': (efficiency-low, high-efficiency)},
+        geometry = geometry.describe(efficiency, edges),
+        **axis_titles(total)
+    )
 
-    supported_keys = supported_obj_keys(file)
+def wilson_interval(passed: NDArray, total: NDArray, z: float = 1.) -> Tuple[NDArray, NDArray, NDArray]:
+    '''Ratio passed/total per bin with its Wilson score interval (`z` standard
+    deviations, 68.3% for 1), vectorized over all bins.
 
-    logging.debug(f"All keys in file: {', '.join([k for k in file.keys()])}")
-    logging.debug(f"Opening supported keys: {', '.join(supported_keys)}")
+    Returns:
+        Tuple[NDArray, NDArray, NDArray]: Ratio, lower and upper edge of the interval.
+    '''
+    passed, total = np.asarray(passed, dtype=np.float64), np.asarray(total, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.where(total > 0, passed / total, np.nan)
+        denominator = 1 + z**2/total
+        center = (ratio + z**2/(2*total)) / denominator
+        half_width = z*np.sqrt(ratio*(1-ratio)/total + z**2/(4*total**2)) / denominator
 
-    objs = {}
-    for obj_name in supported_keys:
-        pkg = ObjPackage(
-            name   = obj_name.split(';')[0],
-            type   = file.classname_of(obj_name)
-        )
+    return ratio, np.clip(center-half_width, 0, 1), np.clip(center+half_width, 0, 1)
 
-        objs[pkg['name']] = pkg
+def extract_many(filepaths: List[str], obj_name: str, max_workers: int = None) -> List[Union[ObjPackage, Exception]]:
+    '''`extract_from_file` of the same object from many files at once (ie.
+    to compare them), reading the files concurrently.
 
-    file.close()
+    Returns:
+        List[Union[ObjPackage, Exception]]: One entry per file, in the order of `filepaths`.
+            Files the object could not be extracted from hold the exception raised instead.
+    '''
+    def extract(filepath):
+        try:
+            return extract_from_file(filepath, obj_name)
+        except Exception as e:
+            logging.warning(f'Could not extract {obj_name} from {filepath}: {e!r}')
+            return e
+
+    with ThreadPoolExecutor(max_workers=max_workers or scan_workers) as executor:
+        return list(executor.map(extract, filepaths))
+
+def files_with_object(filepaths: List[str], obj_name: str) -> List[str]:
+    '''Files (from `filepaths`) that hold an object named `obj_name`, using
+    their catalogs (see `get_file_info`).'''
+    return [
+        filepath for filepath, info in zip(filepaths, get_files_info(filepaths))
+        if not isinstance(info, Exception) and obj_name in info
+    ]
+
+def where(pkg: ObjPackage) -> str:
+    source = pkg.get('source') or {}
+    return f' in {os.path.basename(source["filepath"])}' if 'filepath' in source else ''
+
+def stack_histograms(pkgs: List[ObjPackage]) -> Tuple[NDArray, NDArray, NDArray]:
+    '''Contents and errors of same-binned 1D histograms as 2D arrays (one row
+    per histogram) so they can be compared in one vectorized pass. Histograms
+    without stored errors get Poisson (sqrt of contents) errors.
+
+    Raises:
+        ValueError: If the histograms are not 1D or their bin edges differ.
+
+    Returns:
+        Tuple[NDArray, NDArray, NDArray]: Contents, errors and the common bin edges.
+    '''
+    edges = pkgs[0]['data'][1]
+    for pkg in pkgs:
+        if len(pkg['data']) != 2 or pkg['type'].startswith('TGraph'):
+            raise ValueError(f'Only 1D histograms can be compared ({pkg["name"]} is a {pkg["type"]}).')
+        other = pkg['data'][1]
+        if len(other) != len(edges) or not np.allclose(other, edges, rtol=1e-9, atol=0):
+            raise ValueError(
+                f'Binning of {pkg["name"]}{where(pkg)} is not compatible: {len(other)-1} bins in [{other[0]:g}, {other[-1]:g}] '
+                f'vs {len(edges)-1} bins in [{edges[0]:g}, {edges[-1]:g}].'
+            )
+
+    values = np.stack([np.asarray(pkg['data'][0], dtype=np.float64) for pkg in pkgs])
+    errors = np.stack([
+        np.asarray(pkg['errors']['y'][1], dtype=np.float64) if pkg.get('errors') else np.sqrt(np.abs(pkg['data'][0]))
+        for pkg in pkgs
+    ])
+    return values, errors, edges
+
+def ratios(values: NDArray, errors: NDArray, reference: int = 0) -> Tuple[NDArray, NDArray]:
+    '''Ratio of every row of `values` to the `reference` row, with errors
+    propagated from both (uncorrelated), for all rows and bins at once.
+    Bins where the reference is empty are NaN.'''
+    ref, ref_errors = values[reference], errors[reference]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.where(ref != 0, values / ref, np.nan)
+        ratio_errors = np.sqrt((errors / ref)**2 + (values * ref_errors / ref**2)**2)
+    return ratio, np.where(ref != 0, ratio_errors, np.nan)
+
+def extract_chain(filepaths: List[str], obj_name: str) -> ObjPackage:
+    '''Same-named TTree of several files as a single ChainTree.'''
+    tree = ChainTree(filepaths, obj_name)
+    if len(tree.branches) == 0:
+        tree = 'Could not chain TTrees since they have no supported branches in common.'
+
+    return ObjPackage(
+        name = obj_name,
+        data = tree,
+        type = 'TTree'
+    )
+
+def chainable_trees(files_info: Dict[str, Dict[str, ObjPackage]]) -> Dict[str, List[str]]:
+    '''Names of the TTrees found in more than one file, with the files they are in.
+
+    Args:
+        files_info (Dict[str, Dict[str, ObjPackage]]): File path to output of `get_file_info`.
+
+    Returns:
+        Dict[str, List[str]]: TTree name to file paths.
+    '''
+    trees = {}
+    for filepath, objs in files_info.items():
+        for obj_name, obj in objs.items():
+            if obj['type'].startswith('TTree'):
+                trees.setdefault(obj_name, []).append(filepath)
+    return {name: filepaths for name, filepaths in trees.items() if len(filepaths) > 1}
+
+def file_groups(filepaths: List[str]) -> Dict[str, List[str]]:
+    '''Files of the same directory grouped by the one field their names differ
+    by, ie. the year of `THselection_QCD_16.root` (see `matcher.group`).
+    Computed once per set of files and cached (in memory and on disk).
+
+    Returns:
+        Dict[str, List[str]]: Group label (a path with `*` for the varying
+            field, or the path itself for a file alone in its group) to file paths.
+    '''
+    if len(filepaths) == 0:
+        return {}
+
+    cache_key = ('file_groups', tuple(filepaths))
+    groups = obj_cache.get(filepaths[0], cache_key)
+    if groups is None:
+        groups = obj_cache.put(filepaths[0], cache_key, matcher.group(list(dict.fromkeys(filepaths))), persist=True)
+    return groups
+
+def obj_metadata(file: uprootfile, obj_name: str, classname: str) -> Dict:
+    '''Shape and size of an object - number of bins per axis and entries for
+    histograms, number of entries and (non-edm) branch names for TTrees.
+    Only the object itself is read, never the baskets of a TTree.'''
+    obj = file[obj_name]
+    if classname.startswith('TEfficiency'):
+        total = obj.member('fTotalHistogram')
+        return dict(dims=[len(axis) for axis in total.axes], entries=float(total.member('fEntries')))
+    elif is_histogram(classname):
+        return dict(dims=[len(axis) for axis in obj.axes], entries=float(obj.member('fEntries')))
+    elif classname.startswith('TGraph'):
+        return dict(entries=int(obj.member('fNpoints')))
+    elif classname.startswith('TTree'):
+        return dict(entries=obj.num_entries, branches=obj.keys(filter_branch=edm_filter))
+    return {}
+
+def get_file_info(filepath: str, template: Dict[str, ObjPackage] = None) -> Dict[str, ObjPackage]:
+    '''Supported objects of a file along with their metadata (see `obj_metadata`).
+    Results are kept in the on-disk catalog so that an unchanged file is only scanned once.
+
+    Args:
+        filepath (str): File to scan.
+        template (Dict[str, ObjPackage], optional): Output of this function for
+            another file of the same dataset. If this file has the same objects
+            (names and classes, from its keys alone), no object is read: only
+            their names, types and (this file's) cycles are kept. Metadata that
+            would need reading the objects (see `obj_metadata`) is left out then
+            and read when needed, ie. by `ChainTree`.
+    '''
+    cached = disk_catalog.get(filepath)
+    if cached is not None:
+        logging.debug(f'Using catalog of {filepath} from {disk_catalog}')
+        return {obj_name: ObjPackage(**info) for obj_name, info in cached.items()}
+
+    logging.debug(f'Opening file {filepath}')
+    catalog = file_catalog(filepath)
+    with file_pool.open(filepath) as file:
+        supported_keys = supported_obj_keys(file, catalog=catalog)
+
+        if template is not None and {k: catalog[k]['classname'] for k in supported_keys} \
+                == {k: pkg['type'] for k, pkg in template.items()}:
+            logging.debug(f'Skipping object metadata of {filepath}, its keys match the template')
+            # Only what the keys themselves tell. Dimensions and branches of the
+            # template are not verified for this file, so they are not copied.
+            objs = {
+                obj_name: ObjPackage(name=obj_name, type=pkg['type'], cycle=catalog[obj_name]['cycle'])
+                for obj_name, pkg in template.items()
+            }
+            return disk_catalog.put(filepath, objs)
+
+        logging.debug(f"All keys in file: {', '.join(catalog.keys())}")
+        logging.debug(f"Opening supported keys: {', '.join(supported_keys)}")
+
+        objs = {}
+        for obj_name in supported_keys:
+            pkg = ObjPackage(
+                name   = obj_name,
+                type   = catalog[obj_name]['classname'],
+                cycle  = catalog[obj_name]['cycle']
+            )
+
+            try:
+                for k, v in obj_metadata(file, obj_name, pkg['type']).items():
+                    pkg[k] = v
+            except Exception as e:
+                logging.warning(f'Could not read metadata of {obj_name} in {filepath}: {e!r}')
+
+            objs[pkg['name']] = pkg
+
+    disk_catalog.put(filepath, {obj_name: dict(pkg) for obj_name, pkg in objs.items()})
     return objs
 
+# Number of files scanned at once by get_files_info. Can be set with BRB_SCAN_WORKERS.
+scan_workers = int(os.environ.get('BRB_SCAN_WORKERS', min(32, (os.cpu_count() or 1) + 4)))
+
+def get_files_info(filepaths: List[str], max_workers: int = None,
+                   progress: Callable[[int, int], None] = None,
+                   groups: List[List[str]] = None) -> List[Union[Dict[str, ObjPackage], Exception]]:
+    '''Run `get_file_info` on many files concurrently.
+
+    Args:
+        filepaths (List[str]): Files to scan.
+        max_workers (int, optional): Number of files scanned at once. Defaults to `scan_workers`.
+        progress (Callable[[int, int], None], optional): Called with the number of files
+            scanned so far and the total each time a file is done.
+        groups (List[List[str]], optional): Groups of files expected to hold the
+            same objects (see `file_groups`). The first file of each group is
+            scanned first and used as template for the others (see `get_file_info`).
+
+    Returns:
+        List[Union[Dict[str, ObjPackage], Exception]]: One entry per file, in the order of `filepaths`.
+            Files that could not be scanned hold the exception raised instead of their objects.
+    '''
+    def scan(filepath, template=None):
+        try:
+            return get_file_info(filepath, template)
+        except Exception as e:
+            logging.warning(f'Could not read {filepath}: {e!r}')
+            return e
+
+    template_of = {filepath: members[0] for members in (groups or []) for filepath in members[1:]}
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_workers or scan_workers) as executor:
+        # Templates (and files in no group) first, then the rest of each group
+        for batch in ([f for f in filepaths if f not in template_of], [f for f in filepaths if f in template_of]):
+            futures = {}
+            for filepath in batch:
+                template = results.get(template_of.get(filepath))
+                template = None if isinstance(template, Exception) else template
+                futures[executor.submit(scan, filepath, template)] = filepath
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+                if progress is not None:
+                    progress(len(results), len(filepaths))
+        return [results[filepath] for filepath in filepaths]
+
 if __name__ == '__main__':
     pass
\ No newline at end of file
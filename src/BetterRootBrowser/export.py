@@ -0,0 +1,203 @@
+'''Headless export of every supported object in a set of files to static
+images and/or HTML pages, plus an index page linking them all. Objects are
+rendered across a process pool and a manifest in the output directory records
+what every output was made from, so re-running only renders objects that
+changed (or were added) since the last export.
+
+Usage: python -m BetterRootBrowser.export -o outdir [--formats html,png,svg] [-j N] [--force] file.root [...]
+'''
+import os, sys, json, html, hashlib, argparse, importlib.util, multiprocessing
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from glob import glob, has_magic
+from typing import Dict, List, Tuple
+from BetterRootBrowser import data, graph, scan
+from BetterRootBrowser.cache import file_pool
+
+import logging
+
+formats = ['html', 'png', 'svg']
+manifest_name = 'manifest.json'
+
+def object_fingerprint(filepath: str, obj_name: str) -> List[int]:
+    '''Position, size, timestamp and cycle of the object's key in the file.
+    Any rewrite of the object changes at least one of them, while other
+    objects of the same file being rewritten does not.'''
+    with file_pool.open(filepath) as file:
+        key = file.key(obj_name)
+        return [key.fSeekKey, key.fNbytes, key.fDatime, key.fCycle]
+
+def file_dirs(filepaths: List[str]) -> Dict[str, str]:
+    '''Output directory name of each file: its name without extension, plus a
+    short hash of its full path when several files share a name.'''
+    stems = {f: os.path.splitext(os.path.basename(f))[0] for f in filepaths}
+    counts = Counter(stems.values())
+    return {
+        f: stem if counts[stem] == 1 else f'{stem}-{hashlib.sha1(f.encode()).hexdigest()[:8]}'
+        for f, stem in stems.items()
+    }
+
+def output_base(outdir: str, file_dir: str, obj_name: str) -> str:
+    # One directory per file (so plotly.js is copied once per file), objects
+    # in TDirectories flattened into the file name
+    return os.path.join(outdir, file_dir, obj_name.replace('/', '__'))
+
+def export_object(task: Tuple[str, str, str, str, List[str]]) -> Tuple[str, str, List[str], str]:
+    '''Render one object to every format. Runs in the worker processes.
+
+    Returns:
+        Tuple[str, str, List[str], str]: File path, object name, written
+            outputs (relative to the output directory) and an error message
+            (None if all went well).
+    '''
+    filepath, obj_name, outdir, file_dir, out_formats = task
+    base = output_base(outdir, file_dir, obj_name)
+    try:
+        fig = graph.make_figure(data.extract_from_file(filepath, obj_name))
+        if fig is None:
+            return filepath, obj_name, [], None
+
+        fig.update_layout(title=obj_name, width=900, height=700)
+        os.makedirs(os.path.dirname(base), exist_ok=True)
+        outputs = []
+        for fmt in out_formats:
+            if fmt == 'html':
+                fig.write_html(base+'.html', include_plotlyjs='directory')
+            else:
+                fig.write_image(base+'.'+fmt)
+            outputs.append(os.path.relpath(base+'.'+fmt, outdir))
+        return filepath, obj_name, outputs, None
+
+    except Exception as e:
+        return filepath, obj_name, [], f'{e!r}'
+
+def load_manifest(outdir: str) -> Dict[str, Dict]:
+    try:
+        with open(os.path.join(outdir, manifest_name)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def write_index(outdir: str, manifest: Dict[str, Dict]) -> str:
+    '''index.html listing every exported object, grouped by file, with a
+    thumbnail when an image was exported.'''
+    by_file = {}
+    for entry in manifest.values():
+        by_file.setdefault(entry['file'], []).append(entry)
+
+    sections = []
+    for filepath in sorted(by_file):
+        items = []
+        for entry in sorted(by_file[filepath], key=lambda e: e['name']):
+            links = ' '.join(
+                f'<a href="{html.escape(out)}">{os.path.splitext(out)[1][1:]}</a>' for out in entry['outputs']
+            )
+            images = [out for out in entry['outputs'] if out.endswith(('.png', '.svg'))]
+            thumbnail = f'<img src="{html.escape(images[0])}" loading="lazy" width="300"><br>' if images else ''
+            items.append(f'<div class="obj">{thumbnail}{html.escape(entry["name"])} ({entry["type"]}) {links}</div>')
+        sections.append(f'<h2>{html.escape(filepath)}</h2>\n<div class="grid">\n' + '\n'.join(items) + '\n</div>')
+
+    page = (
+        '<!DOCTYPE html>\n<html><head><meta charset="utf-8"><title>BetterRootBrowser export</title>\n'
+        '<style>body {font-family: sans-serif} .grid {display: flex; flex-wrap: wrap} '
+        '.obj {margin: 0.5em; width: 300px; overflow-wrap: anywhere}</style></head>\n<body>\n'
+        + '\n'.join(sections) + '\n</body></html>\n'
+    )
+    path = os.path.join(outdir, 'index.html')
+    with open(path, 'w') as f:
+        f.write(page)
+    return path
+
+def export(filepaths: List[str], outdir: str, out_formats: List[str] = ['html'],
+           processes: int = scan.processes, force: bool = False) -> Dict[str, Dict]:
+    '''Export every supported (non TTree) object of `filepaths` to `outdir`.
+
+    Args:
+        filepaths (List[str]): ROOT files to export.
+        outdir (str): Output directory, created if needed.
+        out_formats (List[str], optional): Any of `formats`. Images need kaleido. Defaults to ['html'].
+        processes (int, optional): Number of rendering processes. Defaults to `scan.processes`.
+        force (bool, optional): Render everything, even objects unchanged since the last export.
+
+    Returns:
+        Dict[str, Dict]: The new manifest, keyed by "file:object".
+    '''
+    os.makedirs(outdir, exist_ok=True)
+    previous = {} if force else load_manifest(outdir)
+    manifest, tasks = {}, []
+    dirs = file_dirs(filepaths)
+
+    for filepath, info in zip(filepaths, data.get_files_info(filepaths)):
+        if isinstance(info, Exception):
+            logging.error(f'Could not read {filepath}: {info!r}')
+            continue
+
+        for obj_name, obj in info.items():
+            if obj['type'].startswith('TTree'):
+                continue
+
+            key = f'{filepath}:{obj_name}'
+            entry = dict(file=filepath, name=obj_name, type=obj['type'],
+                         fingerprint=object_fingerprint(filepath, obj_name), outputs=[])
+            old = previous.get(key)
+            if (old is not None and old['fingerprint'] == entry['fingerprint']
+                    and all(os.path.exists(os.path.join(outdir, out)) for out in old['outputs'])
+                    and {os.path.splitext(out)[1][1:] for out in old['outputs']} >= set(out_formats)):
+                manifest[key] = old
+            else:
+                manifest[key] = entry
+                tasks.append((filepath, obj_name, outdir, dirs[filepath], out_formats))
+
+    logging.info(f'Rendering {len(tasks)} objects ({len(manifest)-len(tasks)} unchanged) with {processes} processes.')
+    if processes > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('spawn')) as pool:
+            results = list(pool.map(export_object, tasks, chunksize=max(1, len(tasks)//(4*processes))))
+    else:
+        results = [export_object(task) for task in tasks]
+
+    for filepath, obj_name, outputs, error in results:
+        key = f'{filepath}:{obj_name}'
+        if error is not None:
+            logging.error(f'Could not export {obj_name} from {filepath}: {error}')
+            del manifest[key]
+        elif not outputs:
+            del manifest[key]
+        else:
+            manifest[key]['outputs'] = outputs
+
+    with open(os.path.join(outdir, manifest_name), 'w') as f:
+        json.dump(manifest, f, indent=1)
+    write_index(outdir, manifest)
+    return manifest
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='Export every histogram, profile, graph and efficiency in ROOT files to static pages/images.')
+    parser.add_argument('files', nargs='+', help='ROOT files (globs are expanded).')
+    parser.add_argument('-o', '--outdir', required=True, help='Output directory.')
+    parser.add_argument('--formats', default='html', help=f'Comma separated list of {formats}. Images need kaleido installed.')
+    parser.add_argument('-j', '--processes', type=int, default=scan.processes, help='Number of rendering processes.')
+    parser.add_argument('--force', action='store_true', help='Render everything, even unchanged objects.')
+    args = parser.parse_args(argv)
+
+    out_formats = [fmt.strip().lower() for fmt in args.formats.split(',') if fmt.strip()]
+    unknown = set(out_formats) - set(formats)
+    if unknown:
+        parser.error(f'Unknown formats {sorted(unknown)}, choose from {formats}.')
+    if set(out_formats) & {'png', 'svg'} and importlib.util.find_spec('kaleido') is None:
+        parser.error('PNG/SVG export needs kaleido (pip install kaleido).')
+
+    filepaths = []
+    for pattern in args.files:
+        matches = sorted(glob(os.path.expanduser(pattern))) if has_magic(pattern) else [os.path.expanduser(pattern)]
+        filepaths.extend(os.path.abspath(f) for f in matches if os.path.isfile(f))
+    if not filepaths:
+        parser.error('No files found.')
+
+    manifest = export(filepaths, args.outdir, out_formats, args.processes, args.force)
+    print(f'Exported {len(manifest)} objects to {os.path.join(args.outdir, "index.html")}')
+    return 0
+
+if __name__ == '__main__':
+    # data already configures logging (at WARNING)
+    logging.getLogger().setLevel(logging.INFO)
+    sys.exit(main())
@@ -0,0 +1,82 @@
+'''Vectorized bin geometry of histograms of any dimension: bin centers and
+widths, projections, integrals and under/overflow. `describe` computes all of
+them once when a histogram is extracted so they are cached along with it
+(see `data.read_from_file`).
+'''
+from typing import Dict, List, Tuple
+import numpy as np
+from numpy.typing import NDArray
+
+def centers(edges: NDArray) -> NDArray:
+    return (edges[:-1] + edges[1:]) / 2
+
+def widths(edges: NDArray) -> NDArray:
+    return np.diff(edges)
+
+def bin_volumes(edges: List[NDArray]) -> NDArray:
+    '''Width (1D), area (2D) or volume (3D) of every bin.'''
+    volume = np.ones(())
+    for axis_edges in edges:
+        volume = np.multiply.outer(volume, widths(axis_edges))
+    return volume
+
+def projection(values: NDArray, axis: int) -> NDArray:
+    '''Sum of `values` over every axis but `axis`.'''
+    others = tuple(i for i in range(values.ndim) if i != axis)
+    return values.sum(axis=others) if others else values
+
+def project(values: NDArray, axis: int) -> NDArray:
+    '''Sum of `values` over `axis` only, ie. a 3D histogram to 2D.'''
+    return values.sum(axis=axis)
+
+def projections(values: NDArray) -> List[NDArray]:
+    '''Projection on each axis (see `projection`).'''
+    return [projection(values, axis) for axis in range(values.ndim)]
+
+def integral(values: NDArray, edges: List[NDArray] = None) -> float:
+    '''Sum of the bin contents, weighted by the bin volumes if `edges` are given.'''
+    if edges is None:
+        return float(values.sum())
+    return float((values * bin_volumes(edges)).sum())
+
+def split_flow(flow_values: NDArray) -> Tuple[NDArray, List[float], List[float]]:
+    '''Separate the under/overflow bins (first and last along each axis) of a
+    histogram read with `flow=True`.
+
+    Returns:
+        Tuple[NDArray, List[float], List[float]]: In-range bin contents, and
+            per axis the sum of everything in its underflow and overflow bins.
+    '''
+    inner = flow_values[(slice(1, -1),)*flow_values.ndim]
+    underflow = [float(np.take(flow_values, 0, axis=axis).sum()) for axis in range(flow_values.ndim)]
+    overflow = [float(np.take(flow_values, -1, axis=axis).sum()) for axis in range(flow_values.ndim)]
+    return inner, underflow, overflow
+
+def describe(values: NDArray, edges: List[NDArray], flow_values: NDArray = None) -> Dict[str, object]:
+    '''Derived arrays of a histogram, computed once.
+
+    Args:
+        values (NDArray): In-range bin contents.
+        edges (List[NDArray]): Bin edges of each axis.
+        flow_values (NDArray, optional): Bin contents including under/overflow.
+            Defaults to None (no under/overflow known).
+
+    Returns:
+        Dict[str, object]: Per axis `centers`, `widths` and `projections`, plus
+            `integral` (of the in-range bins), `underflow`/`overflow` per axis
+            and `entries` (`integral` plus everything out of range).
+    '''
+    if flow_values is None:
+        underflow = overflow = [0.] * values.ndim
+    else:
+        _, underflow, overflow = split_flow(flow_values)
+
+    return {
+        'centers': [centers(e) for e in edges],
+        'widths': [widths(e) for e in edges],
+        'projections': projections(values),
+        'integral': integral(values),
+        'underflow': underflow,
+        'overflow': overflow,
+        'entries': integral(values) if flow_values is None else float(flow_values.sum()),
+    }
@@ -2,40 +2,149 @@ import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-import json
+from plotly.colors import qualitative
+import os, json, base64
 from dash import dcc, html, dash_table
 import dash_bootstrap_components as dbc
 from dash_bootstrap_templates import load_figure_template
+from BetterRootBrowser import geometry
+from BetterRootBrowser.data import is_additive, stack_histograms, ratios
 
 '''Helpers'''
-def edges_to_centers(x):
-    return np.array([
-        (x[i]+x[i+1])/2 for i in range(len(x)-1)
-    ])
+def axis_geometry(hist_pkg, edges, axis):
+    # Centers and widths of displayed bins, from the geometry cached with the
+    # package (see geometry.describe) when they are the histogram's own bins
+    geo = hist_pkg.get('geometry')
+    if geo is not None and edges is hist_pkg['data'][axis+1]:
+        return geo['centers'][axis], geo['widths'][axis]
+    return geometry.centers(edges), geometry.widths(edges)
+
+def display_projections(hist_pkg, z):
+    geo = hist_pkg.get('geometry')
+    if geo is not None and z is hist_pkg['data'][0]:
+        return geo['projections']
+    return geometry.projections(z)
+
+# Most bins sent to the browser along an axis of a 1D (BRB_DISPLAY_BINS) or
+# 2D (BRB_DISPLAY_BINS_2D) histogram. Finer histograms are merged down to this
+# and re-binned for the window when zooming.
+max_display_bins = int(os.environ.get('BRB_DISPLAY_BINS', 2000))
+max_display_bins_2d = int(os.environ.get('BRB_DISPLAY_BINS_2D', 400))
+
+# Smallest to largest. Plotly.js typed arrays have no 64 bit integers
+_int_dtypes = [np.uint8, np.int8, np.uint16, np.int16, np.uint32, np.int32]
+
+def compact_dtype(array):
+    '''Smallest dtype plotly.js can decode that holds every value of `array`
+    exactly: integer types for integral values, float32 if nothing is lost,
+    float64 otherwise.'''
+    if array.dtype.kind == 'b':
+        return np.dtype(np.uint8)
+    if array.size == 0:
+        return array.dtype if array.dtype in (np.float32, np.float64) else np.dtype(np.float64)
+
+    if array.dtype.kind in 'iu' or (np.isfinite(array).all() and (np.mod(array, 1) == 0).all()):
+        lo, hi = array.min(), array.max()
+        for dtype in _int_dtypes:
+            if np.iinfo(dtype).min <= lo and hi <= np.iinfo(dtype).max:
+                return np.dtype(dtype)
+
+    if array.dtype == np.float32 or np.array_equal(array.astype(np.float32), array, equal_nan=True):
+        return np.dtype(np.float32)
+    return np.dtype(np.float64)
+
+def typed_array(array):
+    '''Plotly typed array spec (dtype plus base64 encoded buffer) of a numpy
+    array, so figure data goes to the browser as binary rather than as a
+    JSON list of numbers. Plotly.js and `assets/transport.js` decode it.'''
+    array = np.asarray(array)
+    array = np.ascontiguousarray(array, dtype=compact_dtype(array))
+    spec = {
+        'dtype': array.dtype.str.lstrip('<|='),
+        'bdata': base64.b64encode(array.tobytes()).decode('ascii')
+    }
+    if array.ndim > 1:
+        spec['shape'] = ', '.join(str(n) for n in array.shape)
+    return spec
+
+def table_payload(df):
+    '''Columnar payload of a table page, with numeric columns as typed arrays
+    (see `typed_array`). Turned back into DataTable records in the browser by
+    `assets/transport.js`, which saves repeating every column name per row.'''
+    return {
+        'columns': [str(c) for c in df.columns],
+        'data': {
+            str(c): typed_array(df[c].to_numpy()) if df[c].dtype.kind in 'biuf' else df[c].astype(str).to_list()
+            for c in df.columns
+        },
+        'length': len(df)
+    }
 
 '''Standard plot makers'''
+def display_kind(obj_pkg):
+    # How an extracted object is shown, shared by the app and static exports
+    if obj_pkg['type'] == 'TTree':
+        return 'tree'
+    elif obj_pkg['type'].startswith('TGraph'):
+        return 'points'
+
+    dims = len(obj_pkg['data']) - 1
+    if dims == 1 and not is_additive(obj_pkg['type']):
+        return 'points'
+    return {1: '1D', 2: 'heatmap', 3: 'volume'}.get(dims)
+
 def make_display(obj_pkg):
     if isinstance(obj_pkg['data'], str):
         return obj_pkg['data']
-    if obj_pkg['type'] == 'TTree':
-        return make_table(obj_pkg)
-    elif obj_pkg['type'].startswith('TH1'):
-        return make_1D(obj_pkg)
-    elif obj_pkg['type'].startswith('TH2'):
-        return make_heatmap(obj_pkg)
-    else:
+
+    makers = {
+        'tree': make_tree_view, 'points': make_points, '1D': make_1D,
+        'heatmap': make_heatmap, 'volume': make_volume
+    }
+    kind = display_kind(obj_pkg)
+    if kind is None:
         return html.Div(f'Object type {obj_pkg["type"]} is not currently supported.')
+    return makers[kind](obj_pkg)
+
+def make_figure(obj_pkg):
+    '''Static plotly figure of an object as it is first displayed in the app
+    (3D histograms projected along z), None for TTrees and unsupported objects.'''
+    kind = display_kind(obj_pkg)
+    if kind == 'points':
+        return figure_points(obj_pkg)
+    elif kind == '1D':
+        return figure_1D(obj_pkg)
+    elif kind == 'heatmap':
+        return figure_heatmap(obj_pkg)
+    elif kind == 'volume':
+        return figure_volume(obj_pkg, 'z', 'projection', 0)
+    return None
 
 def make_heatmap(hist_pkg):
+    return zoomable_graph(hist_pkg, figure_heatmap(hist_pkg))
+
+def figure_heatmap(hist_pkg, view=None):
     try:
         z,x,y = hist_pkg['data']
     except Exception as e:
         print ('DEBUG: %s'%hist_pkg)
         raise e
 
+    # Only the zoomed window, merged down to the display resolution
+    # (averaged rather than summed for profiles and efficiencies)
+    view = view or {}
+    additive = is_additive(hist_pkg['type'])
+    z, x = display_bins(z, x, max_display_bins_2d, view.get('x'), axis=0, average=not additive)
+    z, y = display_bins(z, y, max_display_bins_2d, view.get('y'), axis=1, average=not additive)
+
+    if additive:
+        x_sums, y_sums = display_projections(hist_pkg, z)
+    else:
+        with np.errstate(invalid='ignore'):
+            x_sums, y_sums = np.nanmean(z, axis=1), np.nanmean(z, axis=0)
     z = np.transpose(z)
-    x = edges_to_centers(x)
-    y = edges_to_centers(y)
+    x, _ = axis_geometry(hist_pkg, x, 0)
+    y, _ = axis_geometry(hist_pkg, y, 1)
 
     fig = make_subplots(
         rows=2, cols=2,
@@ -48,24 +157,28 @@ def make_heatmap(hist_pkg):
         shared_xaxes=True, shared_yaxes=True,
         horizontal_spacing=0.01, vertical_spacing=0.01,
     )
-    
+
+    # Binary typed arrays, ie. 1000x1000 bins are ~1 MB rather than ~20 MB of JSON
+    x_sums, y_sums = typed_array(x_sums), typed_array(y_sums)
+    x, y = typed_array(x), typed_array(y)
+
     fig.add_trace(
         go.Bar(
-           x=z.sum(axis=1), y=y, orientation="h",
-           marker=dict(color=z.sum(axis=1), coloraxis="coloraxis2")
+           x=y_sums, y=y, orientation="h",
+           marker=dict(color=y_sums, coloraxis="coloraxis2")
         ), row=2, col=2
     )
 
     fig.add_trace(
         go.Bar(
-           x=x, y=z.sum(axis=0),
-           marker=dict(color=z.sum(axis=0), coloraxis="coloraxis3")
+           x=x, y=x_sums,
+           marker=dict(color=x_sums, coloraxis="coloraxis3")
         ), row=1, col=1
     )
 
     fig.add_trace(
         go.Heatmap(
-            z=z, x=x, y=y,
+            z=typed_array(z), x=x, y=y,
             coloraxis="coloraxis",
             xaxis='x2'
         ), row=2, col=1
@@ -78,7 +191,9 @@ def make_heatmap(hist_pkg):
         coloraxis3=dict(colorscale='thermal', showscale=False),
         showlegend=False,
         template="bootstrap",
-        autosize=True
+        autosize=True,
+        # Keep the user's zoom when the figure is rebuilt for it
+        uirevision=hist_pkg['name']
     )
 
     fig.layout.xaxis2.title = dict(
@@ -95,56 +210,389 @@ def make_heatmap(hist_pkg):
     fig.layout.margin.t = 15
 
     # fig.write_html("plot.html")
-    return dcc.Graph(
-        id=hist_pkg['name'],
-        figure=fig,
-        style={'width': '90%', 'height': '90%'}
-    )
+    return fig
 
 def make_1D(hist_pkg):
+    return zoomable_graph(hist_pkg, figure_1D(hist_pkg))
+
+def figure_1D(hist_pkg, view=None):
     try:
         y,x = hist_pkg['data']
     except Exception as e:
         print ('DEBUG: %s'%hist_pkg)
         raise e
 
-    x = edges_to_centers(x)
+    y, x = display_bins(y, x, max_display_bins, (view or {}).get('x'))
+    x, widths = axis_geometry(hist_pkg, x, 0)
+
+    load_figure_template("sandstorm")
+    fig = go.Figure(go.Bar(
+        x=typed_array(x), y=typed_array(y), width=typed_array(widths),
+        marker=dict(color=float(np.sum(y)), coloraxis="coloraxis")
+    ))
+    fig.update_layout(uirevision=hist_pkg['name'])
+    return fig
+
+def make_points(pkg):
+    return dcc.Graph(id=pkg['name'], figure=figure_points(pkg), style={'width': '90%', 'height': '90%'})
+
+def figure_points(pkg):
+    # Graphs, and 1D profiles/efficiencies as their bin centers with error bars.
+    # Means and ratios can not be merged by summing, so they are never rebinned
+    errors = dict(pkg.get('errors') or {})
+    if pkg['type'].startswith('TGraph'):
+        x, y = pkg['data']
+        mode = 'lines+markers'
+    else:
+        y, edges = pkg['data']
+        x, widths = axis_geometry(pkg, edges, 0)
+        errors['x'] = (widths/2, widths/2)
+        mode = 'markers'
+
+    error_bars = {
+        f'error_{axis}': dict(type='data', symmetric=False, array=typed_array(high), arrayminus=typed_array(low))
+        for axis, (low, high) in errors.items()
+    }
 
     load_figure_template("sandstorm")
-    return dcc.Graph(
-        id=hist_pkg['name'],
-        figure=go.Figure(go.Bar(
-            x=x, y=y,
-            marker=dict(color=sum(y), coloraxis="coloraxis")
-        )),
-        style={'width': '90%', 'height': '90%'}
+    fig = go.Figure(go.Scatter(x=typed_array(x), y=typed_array(y), mode=mode, **error_bars))
+    fig.update_layout(
+        xaxis_title=pkg.get('xtitle'), yaxis_title=pkg.get('ytitle'),
+        uirevision=pkg['name']
     )
+    return fig
 
-def make_table(array_pkg):
-    df = array_pkg['data']
-    df = df.iloc[:100,:14]
+def make_volume(hist_pkg):
+    # 3D histograms are shown one 2D slice or projection at a time, computed
+    # by callbacks.show_volume so the full 3D array never goes to the browser
+    index = hist_pkg['name']
+    return html.Div([
+        dcc.Store(id={'type': 'volume-source', 'index': index}, data=hist_pkg['source']),
+        html.Div([
+            dbc.RadioItems(
+                id={'type': 'volume-mode', 'index': index},
+                options=[{'label': 'Projection', 'value': 'projection'}, {'label': 'Slice', 'value': 'slice'}],
+                value='projection', inline=True
+            ),
+            dbc.RadioItems(
+                id={'type': 'volume-axis', 'index': index},
+                options=[{'label': f'along {axis}', 'value': axis} for axis in 'xyz'],
+                value='z', inline=True, class_name='ms-4'
+            ),
+        ], className='d-flex'),
+        dcc.Slider(
+            id={'type': 'volume-bin', 'index': index},
+            min=0, max=len(hist_pkg['data'][3])-2, step=1, value=0,
+            marks=None, tooltip={'placement': 'bottom'}, disabled=True
+        ),
+        dcc.Graph(
+            id={'type': 'volume-graph', 'index': index},
+            figure=figure_volume(hist_pkg, 'z', 'projection', 0),
+            style={'width': '100%', 'height': '100%'}
+        ),
+    ], style={'width': '90%', 'height': '90%'})
 
-    column_names = df.columns.to_list()
+def figure_volume(hist_pkg, axis, mode, ibin):
+    '''Heatmap of the projection of a 3D histogram along `axis`, or of its
+    `ibin`-th slice along `axis` if `mode` is "slice".'''
+    values, *edges = hist_pkg['data']
+    iaxis = 'xyz'.index(axis)
+    kept = [a for a in 'xyz' if a != axis]
+
+    if mode == 'slice':
+        ibin = min(ibin, len(edges[iaxis])-2)
+        z = np.take(values, ibin, axis=iaxis)
+        name = f"{hist_pkg['name']} {edges[iaxis][ibin]:g} <= {axis} < {edges[iaxis][ibin+1]:g}"
+    elif is_additive(hist_pkg['type']):
+        z = geometry.project(values, iaxis)
+        name = f"{hist_pkg['name']} projected along {axis}"
+    else:
+        with np.errstate(invalid='ignore'):
+            z = np.nanmean(values, axis=iaxis)
+        name = f"{hist_pkg['name']} averaged along {axis}"
+
+    return figure_heatmap({
+        'name': name,
+        'type': hist_pkg['type'].replace('3', '2'),
+        'data': (z, *[e for i, e in enumerate(edges) if i != iaxis]),
+        'xtitle': hist_pkg.get(f'{kept[0]}title', ''),
+        'ytitle': hist_pkg.get(f'{kept[1]}title', ''),
+    })
+
+def make_compare_controls(obj_name, filepaths):
+    # Offered when the displayed histogram is in several of the opened files.
+    # callbacks.compare_histograms fills `compare-area` with the overlay and
+    # callbacks.merge_histograms `merge-area` with the sum (additive histograms only)
+    return html.Div([
+        dcc.Store(id='compare-source', data=obj_name),
+        html.Div([
+            dcc.Dropdown(
+                id='compare-files',
+                options=[{'label': label, 'value': f} for f, label in zip(filepaths, file_labels(filepaths))],
+                value=filepaths, multi=True,
+                placeholder='Files to compare...',
+                className='flex-grow-1'
+            ),
+            dbc.Button('Compare across files', id='compare-button', class_name='ms-2'),
+            dbc.Button('Sum across files', id='merge-button', class_name='ms-2', outline=True, color='primary'),
+        ], className='d-flex'),
+        dbc.Progress(id='merge-progress', value=0, max=1, class_name='mt-2', style={'visibility': 'hidden'}),
+        html.Div(id='compare-area'),
+        html.Div(id='merge-area'),
+    ], className='mb-2')
+
+def file_labels(filepaths):
+    # File names, or full paths if the names are not unique
+    names = [os.path.basename(f) for f in filepaths]
+    return names if len(set(names)) == len(names) else list(filepaths)
+
+def make_overlay(pkgs, labels):
+    return dcc.Graph(id='compare-graph', figure=figure_overlay(pkgs, labels), style={'width': '90%', 'height': '70vh'})
+
+def figure_overlay(pkgs, labels):
+    '''Same-binned 1D histograms overlaid, with their ratio to the first one
+    in a lower panel. Raises ValueError if the binnings differ.'''
+    values, errors, edges = stack_histograms(pkgs)
+
+    # Merge down to the display resolution before taking ratios
+    n_bins = len(edges) - 1
+    if n_bins > max_display_bins:
+        additive = is_additive(pkgs[0]['type'])
+        sizes, _ = rebin(np.ones(n_bins), edges, max_display_bins)
+        squared_errors, _ = rebin(errors**2, edges, max_display_bins, axis=1)
+        values, edges = rebin(values, edges, max_display_bins, axis=1, average=not additive)
+        errors = np.sqrt(squared_errors) if additive else np.sqrt(squared_errors)/sizes
+
+    ratio, ratio_errors = ratios(values, errors)
+    x = typed_array(geometry.centers(edges))
+
+    fig = make_subplots(rows=2, cols=1, shared_xaxes=True, row_heights=[0.7, 0.3], vertical_spacing=0.03)
+    colors = qualitative.Plotly
+    for i, label in enumerate(labels):
+        color = colors[i % len(colors)]
+        fig.add_trace(go.Scatter(
+            x=x, y=typed_array(values[i]), name=label, legendgroup=label,
+            mode='lines', line=dict(shape='hvh', color=color),
+            error_y=dict(type='data', array=typed_array(errors[i]), thickness=1)
+        ), row=1, col=1)
+        fig.add_trace(go.Scatter(
+            x=x, y=typed_array(ratio[i]), name=label, legendgroup=label, showlegend=False,
+            mode='markers', marker=dict(color=color, size=4),
+            error_y=dict(type='data', array=typed_array(ratio_errors[i]), thickness=1)
+        ), row=2, col=1)
+
+    load_figure_template("sandstorm")
+    fig.update_layout(uirevision=pkgs[0]['name'], legend=dict(orientation='h', y=1.02, yanchor='bottom'))
+    fig.update_yaxes(title_text=pkgs[0].get('ytitle') or 'Entries', row=1, col=1)
+    fig.update_yaxes(title_text=f'Ratio to {labels[0]}', row=2, col=1)
+    fig.update_xaxes(title_text=pkgs[0].get('xtitle'), row=2, col=1)
+    return fig
+
+def figure_for(hist_pkg, view=None):
+    if hist_pkg['type'].startswith('TH1'):
+        return figure_1D(hist_pkg, view)
+    return figure_heatmap(hist_pkg, view)
+
+def zoomable_graph(hist_pkg, fig):
+    # Histograms that know where they come from are re-binned by
+    # callbacks.zoom_histogram for the window the user zooms into
+    style = {'width': '90%', 'height': '90%'}
+    source = hist_pkg.get('source')
+    if source is None:
+        return dcc.Graph(id=hist_pkg['name'], figure=fig, style=style)
+
+    index = hist_pkg['name']
+    return html.Div([
+        dcc.Graph(id={'type': 'hist-graph', 'index': index}, figure=fig, style={'width': '100%', 'height': '100%'}),
+        dcc.Store(id={'type': 'hist-source', 'index': index}, data=source),
+        dcc.Store(id={'type': 'hist-view', 'index': index}, data={}),
+    ], style=style)
+
+# Axes of the zoom ranges in relayoutData, for both the 1D and the 2D layout
+# (heatmap on x2/y2, sharing x with the top bar and y with the side bar)
+_view_axes = {'x': ['xaxis', 'xaxis2'], 'y': ['yaxis2', 'yaxis3']}
+
+def zoom_view(relayout, view):
+    '''Visible x/y ranges after a relayout event (None for a full axis),
+    starting from the previous `view`.'''
+    view = dict(view or {})
+    for dim, axes in _view_axes.items():
+        for axis in axes:
+            if relayout.get(f'{axis}.autorange'):
+                view[dim] = None
+            elif f'{axis}.range[0]' in relayout:
+                view[dim] = [relayout[f'{axis}.range[0]'], relayout[f'{axis}.range[1]']]
+            elif f'{axis}.range' in relayout:
+                view[dim] = list(relayout[f'{axis}.range'])
+    return view
+
+'''Display resolution'''
+def display_bins(counts, edges, max_bins, view_range=None, axis=0, average=False):
+    '''Bins of `counts` along `axis` overlapping `view_range` (all if None),
+    merged down to at most `max_bins` (see `rebin`).'''
+    if view_range is not None:
+        start = max(np.searchsorted(edges, min(view_range), side='right') - 1, 0)
+        stop = min(np.searchsorted(edges, max(view_range), side='left'), len(edges) - 1)
+        stop = max(stop, start + 1)
+        counts = np.take(counts, np.arange(start, stop), axis=axis)
+        edges = edges[start:stop+1]
+    return rebin(counts, edges, max_bins, axis, average)
+
+def rebin(counts, edges, max_bins, axis=0, average=False):
+    '''Merge groups of adjacent bins so that there are at most `max_bins`
+    along `axis`. Merged bins hold the sum of their contents, so the
+    integral is unchanged, or their mean if `average` (ie. for profiles).'''
+    n_bins = len(edges) - 1
+    if n_bins <= max_bins:
+        return counts, edges
+
+    starts = np.arange(0, n_bins, int(np.ceil(n_bins / max_bins)))
+    merged = np.add.reduceat(counts, starts, axis=axis)
+    if average:
+        shape = [1] * merged.ndim
+        shape[axis] = -1
+        merged = merged / np.diff(np.append(starts, n_bins)).reshape(shape)
+    return merged, np.append(edges[starts], edges[-1])
+
+'''Tables'''
+def make_table(tree, page_size=100, ncols=14):
+    # Server-side paged table. Only the first page of the first `ncols` branches
+    # is read here, later pages/columns come from callbacks.page_table. Cuts and
+    # sorting are computed by a background job first (callbacks.prepare_table)
+    branches = tree.branches[:ncols]
+    df = table_records(tree.page(0, page_size, branches))
+
+    return html.Div([
+        dbc.Input(
+            id='tree-cut', type='text', debounce=True,
+            placeholder='Selection, ie. nJet > 2 && Jet_pt[0] > 200',
+            invalid=False, class_name='mb-2'
+        ),
+        dbc.Progress(id='table-progress', value=0, max=1, class_name='mb-2', style={'display': 'none'}),
+        # Cut and sorting the table pages are currently read with
+        dcc.Store(id='table-ready', data={'cut': None, 'sort_by': [], 'count': tree.num_entries}),
+        dcc.Dropdown(
+            id='table-columns',
+            options=tree.branches,
+            value=branches,
+            multi=True,
+            placeholder='Branches to display...',
+            className='mb-2'
+        ),
+        # Pages arrive as a columnar payload, turned into records in the browser
+        dcc.Store(id='table-payload', data=table_payload(df)),
+        dash_table.DataTable(
+            id='table',
+            data=[],
+            page_action='custom',
+            page_current=0,
+            page_size=page_size,
+            page_count=max(1, int(np.ceil(tree.num_entries/page_size))),
+            sort_action='custom',
+            sort_mode='single',
+            sort_by=[],
+            style_table={
+                # 'maxWidth': '100%',
+                # 'maxHeight': '100%',
+                'overflow': 'auto',
+                'height': '100%',
+                'width': 'fit-content',
+                'maxWidth': '100%',
+                'paddingRight': '1em'
+            },
+            style_data={
+                'whiteSpace': 'normal',
+                'height': 'auto',
+                'width': 'max-content'         
+            },
+            columns=[]
+        )
+    ], style={'display': 'flex', 'flex-flow': 'column nowrap', 'min-height': 0})
+
+def make_tree_view(array_pkg):
+    # Metadata overview by default. The data tab (table plus histograms) is
+    # only built, and read, once it is opened (see callbacks.show_tree_data)
+    tree = array_pkg['data']
+    return html.Div([
+        dcc.Store(id='table-source', data={'filepaths': tree.filepaths, 'name': tree.name}),
+        dbc.Tabs([
+            dbc.Tab(make_tree_overview(tree), label='Overview', tab_id='overview'),
+            dbc.Tab(html.Div(id='tree-data'), label='Data', tab_id='data'),
+            dbc.Tab(make_tree_summary_panel(), label='Summary', tab_id='summary'),
+        ], id='tree-tabs', active_tab='overview', class_name='mb-2'),
+    ], style={'display': 'flex', 'flex-flow': 'column nowrap', 'min-height': 0, 'overflow': 'auto'})
+
+def make_tree_overview(tree):
+    df = tree.overview()
+    compressed, uncompressed = df['compressed bytes'].sum(), df['uncompressed bytes'].sum()
+    return html.Div([
+        html.P(
+            f'{tree.num_entries} entries, {len(df)} branches, '
+            f'{compressed/2**20:.1f} MB compressed ({uncompressed/2**20:.1f} MB uncompressed)',
+            className='mt-2'
+        ),
+        dash_table.DataTable(
+            id='tree-overview',
+            data=df.to_dict('records'),
+            columns=table_columns(df),
+            sort_action='native',
+            page_action='native',
+            page_size=100,
+            style_table={'overflow': 'auto', 'width': 'fit-content', 'maxWidth': '100%', 'paddingRight': '1em'}
+        )
+    ])
+
+def make_tree_summary_panel():
+    # Statistics need a full pass over the tree so they are only computed on request
+    return html.Div([
+        dbc.Button('Compute branch statistics', id='summary-button', class_name='mt-2'),
+        dbc.Progress(id='summary-progress', value=0, max=1, class_name='mt-2', style={'visibility': 'hidden'}),
+        html.Div(id='tree-summary')
+    ])
+
+def make_tree_summary(df):
     return dash_table.DataTable(
-        id='table',
+        id='tree-summary-table',
         data=df.to_dict('records'),
-        style_table={
-            # 'maxWidth': '100%',
-            # 'maxHeight': '100%',
-            'overflow': 'auto',
-            'height': '100%',
-            'width': 'fit-content',
-            'maxWidth': '100%',
-            'paddingRight': '1em'
-        },
-        style_data={
-            'whiteSpace': 'normal',
-            'height': 'auto',
-            'width': 'max-content'         
-        },
-        columns=[{'name':name, 'id':name} for name in column_names]
+        columns=[
+            {'name': name, 'id': name, 'type': 'numeric', 'format': {'specifier': '.4g'}}
+            if name in ('mean', 'std', 'min', 'max', 'mean multiplicity') else {'name': name, 'id': name}
+            for name in df.columns
+        ],
+        sort_action='native',
+        page_action='native',
+        page_size=100,
+        style_table={'overflow': 'auto', 'width': 'fit-content', 'maxWidth': '100%', 'paddingRight': '1em'}
     )
 
+def make_tree_data(tree):
+    # Table plus a histogram of any branch (picked from the dropdown or by clicking a cell)
+    return html.Div([
+        make_table(tree),
+        html.Div([
+            dcc.Dropdown(
+                id='hist-branch',
+                options=tree.branches,
+                placeholder='Histogram a branch...',
+                className='flex-grow-1'
+            ),
+            dbc.Input(
+                id='hist-bins', type='number',
+                min=1, step=1, value=50,
+                class_name='ms-2', style={'width': '8em'}
+            ),
+        ], className='d-flex mt-2'),
+        dbc.Progress(id='hist-progress', value=0, max=1, class_name='mt-2', style={'visibility': 'hidden'}),
+        html.Div(id='branch-hist')
+    ], style={'display': 'flex', 'flex-flow': 'column nowrap', 'min-height': 0})
+
+def table_records(df):
+    # Entry number becomes a regular (sortable) column
+    return df.rename_axis('entry').reset_index()
+
+def table_columns(df):
+    return [{'name':name, 'id':name} for name in df.columns.to_list()]
+
 '''Layout tools'''
 def figs_in_grid(figlist, ncols=3, nfigs=None):
     if nfigs is None:
@@ -1,343 +1,373 @@
-from statistics import mean
-from collections import Counter, defaultdict
+'''Grouping of file names that only differ by one field, ie. the year in
+`THselection_QCDHT1000_16.root`, `THselection_QCDHT1000_17.root`, ...
+
+Names are split into letter/digit tokens which are interned so the whole set
+is one integer matrix (one row per name, one column per token position, 0 for
+blank). Everything else is vectorized over that matrix:
+
+1. Tokens that always appear together (`QCDHT` `1000`) are merged.
+2. Rows with fewer tokens get their blanks placed where they lower the total
+   column entropy the most, so that similar tokens line up in columns. Column
+   entropies are kept as token counts and only updated for the rows that move.
+3. Columns that determine each other are merged (`merge_next_col`).
+4. The member column is the one that varies the most independently of all
+   others. Names equal in every other column form a group.
+
+Paths are grouped directory by directory, on their file names only.
+'''
+from typing import Dict, List, Tuple
 import numpy as np
-import re, itertools, math
+from numpy.typing import NDArray
+import os, re
 
 import logging
-logging.basicConfig(filename='example.log', filemode='w', level=logging.DEBUG, format='%(levelname)s:  %(message)s')
 
-'''-----------Base array creation and conversion----------------'''
-def tokenize(items):
-    split_items = [re.findall('[a-zA-Z]+|[0-9]+',item) for item in items]
-
-    # Pad with empty strings
-    max_tokens = max([len(tkns) for tkns in split_items])
-    for i,tkns in enumerate(split_items):
-        if len(tkns) < max_tokens:
-            split_items[i].extend(['']*(max_tokens-len(tkns)))
-
-    return np.array(split_items).astype('U256')
-
-def to_Tokens(a):
-    out = a.copy().astype('object')
-    for irow, icol in itertools.product(range(a.shape[0]),range(a.shape[1])):
-        out[irow][icol] = Token(irow, icol, a[irow][icol])
-
-    out = set_token_tensions(out)
-
-    return out
-
-def to_array(tokens):
-    return np.ndarray([[tkn.val for tkn in row] for row in tokens]).astype('U256')
-
-
-'''-----------Token tensions + metrics--------------------'''
-def set_token_tensions(tokens):
-    for token in tokens:
-        other_token_idxs = get_matching_idxs(token, to_array(tokens))
-        other_tokens = tokens.take(other_token_idxs)
-        distances = [distance_between(token, other) for other in other_tokens]
-        # Total "spring force" of the other tokens
-        raw_tension = mean(distances)
-        # Net force which accounts for no room to move in direction of spring force (ie. there's a wall)
-        token.tension = 0
-        if raw_tension > 0 and has_room_right(token):
-            token.tension = raw_tension
-        elif raw_tension < 0 and has_room_left(token):
-            token.tension = raw_tension
-    
-    return tokens
-
-def get_matching_idxs(token, tokens):
-    a = to_array(tokens)
-    return [idx for idx in zip(
-                *np.where(a == token.val)
-        ) if idx != token.idx
-    ]
-
-def distance_between(token, other):
-    return other.col - token.col
-
-def entropy_of_col(tokens, icol):
-    col = [t.val for t in tokens[:, icol]]
-    counter = Counter(col)
-    total = sum([v for v in counter.values()])
-    probs = [count/total for count in counter.values()]
-    out = sum(-p*math.log(p) for p in probs)
-    return out
-
-def total_entropy(tokens):
-    return sum(entropy_of_col(tokens, icol) for icol in range(tokens.shape[1]))
-
-'''------------------Helpers----------------------------'''
-def _get_direction(direction, left, right):
-    if direction == '':
-        if left:
-            direction = 'l'
-        elif right:
-            direction = 'r'
-    
-    if direction not in ['l','r']:
-        raise ValueError('Arg direction must be either "l" or "r" or arg left or right must be set to True.')
-
-    return direction
-
-def get_matching_idxs(token, tokens):
-    a = to_array(tokens)
-    return [idx for idx in zip(
-                *np.where(a == token.val)
-        ) if idx != token.idx
-    ]
+token_pattern = re.compile('[a-zA-Z]+|[0-9]+')
 
-'''----------------Array manipulations--------------------'''
-def merge_next_col(tokens, icol):
-    '''TODO: Needs to check that, if a column is already uniform, that no merge happens'''
-    out = to_array(tokens)
-    if icol+1 < out.shape[1]:
-        new_row = []
-        for a,b in zip(out[:, icol], out[:, icol+1]):
-            if b == '':
-                new_row.append(a)
-            else:
-                new_row.append(f'{a}-{b}')
-        out[:, icol] = np.array(new_row, dtype='U256')
-        out = np.delete(out, icol+1, 1)
-    else:
-        logging.debug(f'Next column {icol+1} does not exist in array with {out.shape[1]} columns. Will not attempt merge.')
-    return to_Tokens(out)
-
-def merge_next_cell(token, tokens, check_for_others=True):
-    '''TODO: Needs to check that, if a column is already uniform, that no merge happens.'''
-    irow, icol = token.idx
-    out = to_array(tokens)
-    if icol+1 < out.shape[0]:
-        if out[irow, icol+1] != '':
-            out[irow, icol] = f'{out[irow,icol]}-{out[irow,icol+1]}'
-
-        temp = np.delete(out[irow], icol+1)
-        out[irow] = np.append(temp, [''])
-
-        if check_for_others:
-            other_pair_idxs = other_merged_pairs(out[irow, icol], tokens)
-            for other_idx in other_pair_idxs:
-                out = merge_next_cell(tokens[other_idx], tokens, False)
-
-    else:
-        logging.debug(f'Next column {icol+1} does not exist in array with {out.shape[1]} columns. Will not attempt merge.')
-    
-    return to_Tokens(out)
-
-def other_merged_pairs(val, tokens):
-    a = to_array(tokens)
-    n_lists, n_tokens = a.shape
-    out = []
-    for irow, icol in itertools.product(range(n_lists), range(n_tokens-1)):
-        if a[irow, icol+1] != '':
-            pair = f'{a[irow, icol]}-{a[irow, icol+1]}'
-        else:
-            pair = a[irow, icol]
-        if pair == val:
-            out.append((irow,icol))
-
-    return out
-
-def has_room_right(token, tokens):
-    return has_room(token, tokens, direction='r')
-def has_room_left(token, tokens):
-    return has_room(token, tokens, direction='l')
-def has_room(token, tokens, direction='', left=False, right=False):
-    d = _get_direction(direction, left, right)
-    irow, icol = token.idx
-    a = to_array(tokens)
-    if d == 'r':
-        if (a[irow,icol+1:] == '').any():
-            return True
-        else:
-            return False
-    elif d == 'l':
-        if (a[irow,:icol] == '').any():
-            return True
-        else:
-            return False
-
-def nearest_blank_left(token, tokens):
-    return nearest_blank(token, tokens, direction='l')   
-def nearest_blank_right(token, tokens):
-    return nearest_blank(token, tokens, direction='r')
-def nearest_blank(token, tokens, direction='', left=False, right=False):
-    d = _get_direction(direction, left, right)
-    irow, icol = token.idx
-    a = to_array(tokens)
-    if d == 'r':
-        all_right_idxs = list(
-            zip(
-                *np.where(a[irow, icol+1:] == '')
-            )
-        )
-        return all_right_idxs[0]
-    
-    elif d == 'l':
-        all_left_idxs = list(
-            zip(
-                *np.where(a[irow, :icol] == '')
-            )
-        )
-        return all_left_idxs[-1]
-
-def slide_token(token, tokens, direction='', left=False, right=False):
-    d = _get_direction(direction, left, right)
-    irow, icol = token.idx
-    out = to_array(tokens)
-
-    next_blank_idx = nearest_blank(tokens, irow, icol, d)
-
-    if d == 'r':
-        if has_room_right(token, tokens):
-            new_row = out[irow, icol:next_blank_idx]
-            out[irow, icol+1:next_blank_idx+1] = new_row
-            out[irow, icol] = ''
-        else:
-            logging.debug(f'Cannot move right because there are no empty tokens to use. {out[irow]}')
-    
-    elif d == 'l':
-        if has_room_left(token):
-            new_row = out[irow, next_blank_idx+1:icol+1]
-            out[irow, next_blank_idx:icol] = new_row
-            out[irow, icol] = ''
-        else:
-            logging.debug(f'Cannot move left because there are no empty tokens to use. {out[irow]}')
+'''-----------Base array creation and conversion----------------'''
+def tokenize(items: List[str]) -> Tuple[NDArray, NDArray, List[str]]:
+    '''Split each item into letter/digit tokens, interned as integer codes.
+
+    Returns:
+        Tuple[NDArray, NDArray, List[str]]: Codes (n items x max tokens, padded
+            with 0 which is the blank token), start/end position of each token
+            in its item (n x max tokens x 2) and the vocabulary (token of each code).
+    '''
+    vocab, index = [''], {'': 0}
+    rows = []
+    for item in items:
+        row = []
+        for match in token_pattern.finditer(item):
+            code = index.get(match.group())
+            if code is None:
+                code = index[match.group()] = len(vocab)
+                vocab.append(match.group())
+            row.append((code, match.start(), match.end()))
+        rows.append(row)
+
+    max_tokens = max([len(row) for row in rows] + [1])
+    codes = np.zeros((len(items), max_tokens), dtype=np.int64)
+    spans = np.zeros((len(items), max_tokens, 2), dtype=np.int64)
+    for irow, row in enumerate(rows):
+        if row:
+            row = np.array(row)
+            codes[irow, :len(row)] = row[:, 0]
+            spans[irow, :len(row)] = row[:, 1:]
+
+    return codes, spans, vocab
+
+'''-----------Entropy--------------------'''
+def xlogx(counts: NDArray) -> NDArray:
+    counts = np.asarray(counts, dtype=np.float64)
+    return counts * np.log(np.where(counts > 0, counts, 1))
+
+def entropy_from_counts(counts: NDArray, axis: int = -1) -> NDArray:
+    '''Entropy of the distribution(s) given by `counts` along `axis`.'''
+    n = counts.sum(axis=axis)
+    return np.log(np.maximum(n, 1)) - xlogx(counts).sum(axis=axis) / np.maximum(n, 1)
+
+def entropy_of_codes(codes: NDArray) -> float:
+    '''Entropy of the values of a column (or of whole rows for a 2D array).'''
+    if codes.ndim > 1:
+        codes = row_keys(codes)
+    return float(entropy_from_counts(np.unique(codes, return_counts=True)[1]))
+
+def column_counts(codes: NDArray, size: int) -> NDArray:
+    '''Count of every code (< `size`) in every column, as a (columns x size) array.'''
+    ncols = codes.shape[1]
+    flat = (codes + np.arange(ncols)*size).ravel()
+    return np.bincount(flat, minlength=ncols*size).reshape(ncols, size)
+
+def row_keys(codes: NDArray) -> NDArray:
+    '''One integer per row, equal for equal rows.'''
+    keys = np.zeros(codes.shape[0], dtype=np.int64)
+    for icol in range(codes.shape[1]):
+        _, keys = np.unique(keys * (codes[:, icol].max()+1) + codes[:, icol], return_inverse=True)
+    return keys.reshape(-1)
 
 '''--------------------------Classes------------------------------'''
 class TokenArray():
-    def __init__(self, list_of_strs) -> None:
-        self.raw_items = list_of_strs
-        self.tokens = to_Tokens(tokenize(self.raw_items))
-        self.frozen_idxs = []
+    '''Integer-coded token matrix of a list of names (see the module docstring).
+
+    Attributes:
+        raw_items (List[str]): The names.
+        codes (NDArray): Token code of every name (rows) and position (columns), 0 for blank.
+        spans (NDArray): Start/end of every token in its name.
+        vocab (List[str]): Token of each code.
+    '''
+    def __init__(self, list_of_strs: List[str]) -> None:
+        self.raw_items = list(list_of_strs)
+        self.codes, self.spans, self.vocab = tokenize(self.raw_items)
+        self.index = {tkn: code for code, tkn in enumerate(self.vocab)}
+        self._recount()
 
     @property
-    def a(self):
-        return to_array(self.tokens)
-
-    def inplace(self, new_tokens, flag, bypass_sanity=False):
-        if flag:
-            self.tokens = self.sanity(new_tokens, bypass_sanity) # this is the only place self.tokens is modified!
-            return None
-        else:
-            return new_tokens
-
-    def sanity(self, new_tokens, bypass_sanity):
-        # Check no currently frozen Tokens are changing
-        if not bypass_sanity:
-            for idx in self.frozen_idxs:
-                if self.a[idx] != to_array(new_tokens)[idx]:
-                    logging.warning('New tokens did not pass sanity check. Modified a frozen value at %s. Printing current array:\n%s'%(idx, self.a))
-                    return self.tokens
-        
-        # Look for new frozen tokens and freeze them
-        self.frozen_idxs = [] # need to reset in the case that a frozen column shifted from merge_next_col
-        for icol in range(new_tokens.shape[1]):
-            col = new_tokens[:, icol]
-            if (col == col[0]).all():
-                for irow in range(new_tokens.shape[0]):
-                    self.frozen_idxs.append((irow, icol))
-
-        return new_tokens
+    def a(self) -> NDArray:
+        '''The tokens as strings.'''
+        return np.array(self.vocab, dtype=object)[self.codes]
+
+    def _intern(self, token: str) -> int:
+        code = self.index.get(token)
+        if code is None:
+            code = self.index[token] = len(self.vocab)
+            self.vocab.append(token)
+        return code
+
+    def _recount(self) -> None:
+        # Per column token counts and sum of count*log(count), from which the
+        # column entropies follow without looking at the matrix again
+        self._counts = column_counts(self.codes, len(self.vocab))
+        self._xlogx = xlogx(self._counts).sum(axis=1)
 
     '''============ Entropy =================='''
-    def entropy_of_col(self, icol):
-        return entropy_of_col(self.tokens, icol)
-
-    def total_entropy(self):
-        return total_entropy(self.tokens)
-
-    def diff_entropy(self, new_tokens):
-        # Negative if new tokens are better (entropy decreases)
-        return total_entropy(new_tokens) - self.total_entropy()
-
-    def entropy_per_merge(self, token_array=None):
-        if token_array is None:
-            token_array = self.tokens
-
-        n_lists, n_tokens = token_array.shape
-        entropy_gain_per_merge = np.zeros((n_lists,n_tokens-1))
-        for ilist, itkn in itertools.product(range(n_lists), range(n_tokens-1)):
-            new_tokens = merge_next_cell(token_array[ilist,itkn], token_array)
-            entropy_gain_per_merge[ilist, itkn] = self.diff_entropy(new_tokens)
-
-        return entropy_gain_per_merge
-
-    '''=============== Tension ====================='''
-    def connection_tension(self, token, k=1):
-        return k * distance_between(token, self.tokens)/self.tokens.shape[1]
-
-    def compression_force(self, token, k=1):
-        left_compression, l_idxs_to_merge = 0, None
-        right_compression, r_idxs_to_merge = 0, None
-        merge_possibilities = self.entropy_per_merge()[token.row]
-
-        if not has_room_right(token, self.tokens):
-            right_half = merge_possibilities[token.col:]
-            if (right_half < 0).any():
-                best_compress_idxs = list(
-                    zip(
-                        *np.where(right_half == right_half.min())
-                    )
-                )
-                right_compression = sum(right_half.take(best_compress_idxs))
-                r_idxs_to_merge = best_compress_idxs+token.col # convert back to merge_possibilities indexing
-
-        if not has_room_left(token, self.tokens):
-            left_half = merge_possibilities[:token.col]
-            if (left_half < 0).any():
-                best_compress_idxs = list(
-                    zip(
-                        *np.where(left_half == left_half.min())
-                    )
-                )
-                left_compression = sum(left_half.take(best_compress_idxs))
-                l_idxs_to_merge = best_compress_idxs # already in merge_possibilities indexing
-
-        return k*right_compression, k*left_compression, l_idxs_to_merge, r_idxs_to_merge
+    def entropies(self) -> NDArray:
+        n = max(len(self.raw_items), 1)
+        return np.log(n) - self._xlogx / n
+
+    def entropy_of_col(self, icol: int) -> float:
+        return float(self.entropies()[icol])
+
+    def total_entropy(self) -> float:
+        return float(self.entropies().sum())
 
+    def entropy_per_merge(self) -> NDArray:
+        '''Change in total entropy from merging each column with the next one
+        (never positive: it is minus their mutual information).'''
+        entropies = self.entropies()
+        joint = [entropy_of_codes(self.codes[:, icol:icol+2]) for icol in range(self.codes.shape[1]-1)]
+        return np.array(joint) - entropies[:-1] - entropies[1:]
 
     '''============ Manipulations =================='''
-    def merge_next_cell(self, token, in_place=False):
-        result = merge_next_cell(token, self.tokens)
-        return self.inplace(result, in_place)
-
-    def merge_next_col(self, icol, in_place=False):
-        result = merge_next_col(self.tokens, icol)
-        return self.inplace(result, in_place, True)
-
-    def slide_token_right(self, token, in_place=False):
-        result = slide_token(token, self.tokens, 'r')
-        return self.inplace(result, in_place)
-            
-    def slide_token_left(self, token, in_place=False):
-        result = slide_token(token, self.tokens, 'l')
-        return self.inplace(result, in_place)
-
-    def drop_col(self, icol, in_place=False):
-        result = np.delete(self.tokens, icol, 1)
-        return self.inplace(result, in_place)
-
-class Token():
-    def __init__(self, row, col, val) -> None:
-        self.row = row
-        self.col = col
-        self.val = val
-        self.tension = 0
+    def merge_cooccurring(self) -> int:
+        '''Merge every pair of tokens that only ever appear next to each other,
+        in every row at once. Chains (`htag` `0` `p` `8`) take one pass per link.
+
+        Returns:
+            int: Number of distinct pairs merged.
+        '''
+        nmerged = 0
+        while self.codes.shape[1] > 1:
+            size = len(self.vocab)
+            left, right = self.codes[:, :-1], self.codes[:, 1:]
+            keys = np.where((left > 0) & (right > 0), left*size + right, -1)
+            pairs, pair_counts = np.unique(keys[keys >= 0], return_counts=True)
+            first, second = pairs // size, pairs % size
+            token_counts = np.bincount(self.codes.ravel(), minlength=size)
+            ok = (pair_counts == token_counts[first]) & (pair_counts == token_counts[second]) & (first != second)
+            # Only the heads of chains, so no token is in two merged pairs
+            ok &= ~np.isin(first, second[ok])
+            if not ok.any():
+                break
+
+            pairs = pairs[ok]
+            merged_codes = np.array([self._intern(f'{self.vocab[a]}-{self.vocab[b]}') for a, b in zip(first[ok], second[ok])])
+            irows, icols = np.nonzero(np.isin(keys, pairs))
+            self.codes[irows, icols] = merged_codes[np.searchsorted(pairs, keys[irows, icols])]
+            self.spans[irows, icols, 1] = self.spans[irows, icols+1, 1]
+            self.codes[irows, icols+1] = -1
+            self._pack()
+            nmerged += len(pairs)
+
+        self._recount()
+        logging.debug(f'Merged {nmerged} co-occurring token pairs.')
+        return nmerged
+
+    def _pack(self) -> None:
+        # Drop cells marked -1 by shifting the rest of their row left
+        order = np.argsort(self.codes == -1, axis=1, kind='stable')
+        self.codes = np.take_along_axis(self.codes, order, axis=1)
+        self.spans = np.take_along_axis(self.spans, order[:, :, None], axis=1)
+        dropped = self.codes == -1
+        self.codes[dropped] = 0
+        self.spans[dropped] = 0
+        width = max(int((self.codes > 0).sum(axis=1).max()), 1)
+        self.codes, self.spans = self.codes[:, :width], self.spans[:, :width]
+
+    def align(self, max_passes: int = 5) -> float:
+        '''Place the blanks of rows shorter than the longest one so the total
+        column entropy is lowest. All rows with the same number of tokens get
+        one run of blanks at the same position, chosen in turn for each
+        length until nothing changes.
+
+        Returns:
+            float: Total entropy after alignment.
+        '''
+        ncols, size = self.codes.shape[1], len(self.vocab)
+        self._pack_left()
+        lengths = (self.codes > 0).sum(axis=1)
+        groups = {L: np.nonzero(lengths == L)[0] for L in np.unique(lengths) if L < ncols}
+        packed = {L: (self.codes[rows, :L], self.spans[rows, :L]) for L, rows in groups.items()}
+        place = {L: L for L in groups}
+
+        def placed(L, p, block):
+            blank = np.zeros((block.shape[0], ncols-L) + block.shape[2:], dtype=block.dtype)
+            return np.concatenate([block[:, :p], blank, block[:, p:]], axis=1)
+
+        n = len(self.raw_items)
+        for _ in range(max_passes):
+            changed = False
+            for L, rows in groups.items():
+                codes, _ = packed[L]
+                # Counts of every other row stay as they are, only this group moves
+                rest = self._counts - column_counts(placed(L, place[L], codes), size)
+                candidates = [
+                    (np.log(n) - (xlogx(rest + column_counts(placed(L, p, codes), size)).sum(axis=1)/n)).sum()
+                    for p in range(L+1)
+                ]
+                best = int(np.argmin(candidates))
+                if candidates[best] < candidates[place[L]] - 1e-12:
+                    place[L], changed = best, True
+                self._counts = rest + column_counts(placed(L, place[L], codes), size)
+            if not changed:
+                break
+
+        for L, rows in groups.items():
+            codes, spans = packed[L]
+            self.codes[rows], self.spans[rows] = placed(L, place[L], codes), placed(L, place[L], spans)
+        self._recount()
+        return self.total_entropy()
+
+    def _pack_left(self) -> None:
+        self.codes[self.codes == 0] = -1
+        self._pack()
+        self.codes = np.pad(self.codes, ((0, 0), (0, self._counts.shape[0]-self.codes.shape[1])))
+        self.spans = np.pad(self.spans, ((0, 0), (0, self._counts.shape[0]-self.spans.shape[1]), (0, 0)))
+        self._recount()
+
+    def merge_next_col(self, icol: int) -> None:
+        '''Merge column `icol` with the next one. Only those two columns' entropies are recomputed.'''
+        if icol+1 >= self.codes.shape[1]:
+            logging.debug(f'Next column {icol+1} does not exist in array with {self.codes.shape[1]} columns. Will not attempt merge.')
+            return
+
+        first, second = self.codes[:, icol], self.codes[:, icol+1]
+        pairs, inverse = np.unique(first*len(self.vocab) + second, return_inverse=True)
+        merged_codes = np.array([
+            a or b if not (a and b) else self._intern(f'{self.vocab[a]}-{self.vocab[b]}')
+            for a, b in zip(*np.divmod(pairs, len(self.vocab)))
+        ])
+        self.codes[:, icol] = merged_codes[inverse.reshape(-1)]
+        starts = np.where(first > 0, self.spans[:, icol, 0], self.spans[:, icol+1, 0])
+        ends = np.where(second > 0, self.spans[:, icol+1, 1], self.spans[:, icol, 1])
+        self.spans[:, icol, 0], self.spans[:, icol, 1] = starts, ends
+        self.codes = np.delete(self.codes, icol+1, axis=1)
+        self.spans = np.delete(self.spans, icol+1, axis=1)
+
+        size = len(self.vocab)
+        counts = np.delete(self._counts, icol+1, axis=0)
+        self._counts = np.pad(counts, ((0, 0), (0, size-counts.shape[1])))
+        self._counts[icol] = np.bincount(self.codes[:, icol], minlength=size)
+        self._xlogx = np.delete(self._xlogx, icol+1)
+        self._xlogx[icol] = xlogx(self._counts[icol]).sum()
+
+    def merge_dependent_cols(self) -> int:
+        '''Merge neighbouring varying columns when either one determines the
+        other (they hold a single field split in two).
+
+        Returns:
+            int: Number of merges.
+        '''
+        nmerged = 0
+        while self.codes.shape[1] > 1:
+            entropies = self.entropies()
+            gains = self.entropy_per_merge()
+            dependent = (entropies[:-1] > 1e-12) & (entropies[1:] > 1e-12) \
+                & np.isclose(gains, -np.minimum(entropies[:-1], entropies[1:]))
+            if not dependent.any():
+                break
+            self.merge_next_col(int(np.argmax(dependent)))
+            nmerged += 1
+        return nmerged
+
+    '''============ Grouping =================='''
+    def member_col(self) -> int:
+        '''Column that varies the most independently of all the others
+        (highest entropy given the other columns, relative to its own entropy),
+        preferring the one with fewest distinct values. None if no column varies.'''
+        entropies = self.entropies()
+        varying = np.nonzero(entropies > 1e-12)[0]
+        if not len(varying):
+            return None
 
-    @property
-    def idx(self):
-        return (self.row, self.col)
+        # Keys of all columns before and after each one, so the key of every
+        # column but one is a single extra unique
+        ncols = self.codes.shape[1]
+        before = [np.zeros(len(self.raw_items), dtype=np.int64)]
+        for icol in range(ncols):
+            before.append(row_keys(np.stack([before[-1], self.codes[:, icol]], axis=1)))
+        after = [np.zeros(len(self.raw_items), dtype=np.int64)]
+        for icol in reversed(range(ncols)):
+            after.insert(0, row_keys(np.stack([self.codes[:, icol], after[0]], axis=1)))
+
+        total = entropy_of_codes(before[-1])
+        scores = []
+        for icol in varying:
+            rest = entropy_of_codes(np.stack([before[icol], after[icol+1]], axis=1))
+            ndistinct = np.count_nonzero(self._counts[icol])
+            scores.append((round((total - rest) / entropies[icol], 9), -ndistinct, icol))
+        return int(max(scores)[2])
+
+    def groups(self) -> Dict[str, List[str]]:
+        '''Names grouped by everything but the member column (see `member_col`).
+
+        Returns:
+            Dict[str, List[str]]: Names per group label, which is the first
+                name of the group with its member field replaced by `*` (the
+                name itself for a group of one).
+                Groups are in order of their first name.
+        '''
+        icol = self.member_col()
+        if icol is None:
+            return {item: [item] for item in dict.fromkeys(self.raw_items)}
+
+        keys = row_keys(np.delete(self.codes, icol, axis=1))
+        # Label from the first row of each group with a member, else its first row
+        # (as is for a group of one)
+        sizes = np.bincount(keys)
+        has_member = self.codes[:, icol] > 0
+        order = np.lexsort((np.arange(len(keys)), ~has_member, keys))
+        first = order[np.r_[True, keys[order][1:] != keys[order][:-1]]]
+        labels = {}
+        for irow in first:
+            item = self.raw_items[irow]
+            if has_member[irow] and sizes[keys[irow]] > 1:
+                start, end = self.spans[irow, icol]
+                item = item[:start] + '*' + item[end:]
+            labels[keys[irow]] = item
+
+        out = {}
+        for item, key in zip(self.raw_items, keys):
+            out.setdefault(labels[key], []).append(item)
+        return out
+
+def group(items: List[str]) -> Dict[str, List[str]]:
+    '''Group names that only differ by one field (see the module docstring).
+    Paths are only grouped with the others of their directory, by file name,
+    so files of different directories are never in the same group. Groups are
+    in order of their first name.'''
+    directories = {}
+    for item in items:
+        name = os.path.basename(item)
+        directories.setdefault(item[:len(item)-len(name)], []).append(name)
+
+    out = {}
+    for directory, names in directories.items():
+        token_array = TokenArray(names)
+        token_array.merge_cooccurring()
+        token_array.align()
+        token_array.merge_dependent_cols()
+        for label, members in token_array.groups().items():
+            out[directory+label] = [directory+name for name in members]
+
+    first = {item: i for i, item in reversed(list(enumerate(items)))}
+    return dict(sorted(out.items(), key=lambda group: first[group[1][0]]))
 
 if __name__ == '__main__':
     test_strs = [
-        # "THselection_Data_16.root",
-        # "THselection_Data_17.root",
-        # "THselection_Data_18.root",
-        # "THselection_Data_Run2.root",
+        "THselection_Data_16.root",
+        "THselection_Data_17.root",
+        "THselection_Data_18.root",
+        "THselection_Data_Run2.root",
         "THselection_QCD_16.root",
         "THselection_QCD_17.root",
         "THselection_QCD_18.root",
@@ -347,4 +377,6 @@ if __name__ == '__main__':
         "THselection_QCDHT1000_htag0p8_16.root",
         "THselection_QCDHT1000_htag0p8_17.root",
         "THselection_QCDHT1000_htag0p8_18.root",
-    ]
\ No newline at end of file
+    ]
+    for label, names in group(test_strs).items():
+        print(label, names)
@@ -0,0 +1,151 @@
+'''hadd-like merging of histograms across files, in memory. Files are read
+concurrently, bypassing the object cache (see `data.read_from_file`), and
+each one's contents and sums of squared weights are added in place into a
+single accumulator per histogram as soon as it is read, so memory does not
+grow with the number of files.
+'''
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Dict, List, Tuple
+import numpy as np
+from numpy.typing import NDArray
+from BetterRootBrowser import data, geometry
+from BetterRootBrowser.data import ObjPackage
+from BetterRootBrowser.cache import obj_cache, file_stamp
+
+import logging
+
+def mergeable_names(filepath: str, paths: List[str]) -> List[str]:
+    '''Histograms of a file named in `paths`, or inside a directory named in `paths`.
+    Only additive histograms (not profiles or efficiencies) can be summed.'''
+    names = []
+    for name, entry in data.file_catalog(filepath).items():
+        if not any(name == p or name.startswith(p.rstrip('/')+'/') for p in paths):
+            continue
+        if entry['classname'].startswith('TH') and data.is_additive(entry['classname']) \
+                and not entry['classname'].startswith(tuple(data.unsupported_classes)):
+            names.append(name)
+    return names
+
+def _read_file(filepath: str, paths: List[str]) -> Dict[str, Tuple[ObjPackage, NDArray]]:
+    # Contents and sum of squared weights (from the errors) of every histogram of one file
+    out = {}
+    for name in mergeable_names(filepath, paths):
+        # Not through the object cache, which would otherwise fill up with
+        # every file's copy and evict everything else
+        pkg = data.read_from_file(filepath, name)
+        out[name] = (pkg, pkg['errors']['y'][1]**2)
+    return out
+
+class Accumulator():
+    '''Running sum of one histogram: contents, sum of squared weights,
+    under/overflow and total contents (flow included), plus the number of
+    files added.'''
+    def __init__(self, pkg: ObjPackage, sumw2: NDArray) -> None:
+        values, *self.edges = pkg['data']
+        self.name, self.type = pkg['name'], pkg['type']
+        self.titles = {k: pkg[k] for k in ('xtitle', 'ytitle', 'ztitle') if k in pkg}
+        self.values = np.array(values, dtype=np.float64)
+        self.sumw2 = np.array(sumw2, dtype=np.float64)
+        self.underflow = np.array(pkg['geometry']['underflow'])
+        self.overflow = np.array(pkg['geometry']['overflow'])
+        self.entries = pkg['geometry']['entries']
+        self.nfiles = 1
+
+    def add(self, pkg: ObjPackage, sumw2: NDArray, filepath: str) -> None:
+        values, *edges = pkg['data']
+        if len(edges) != len(self.edges) or any(
+            len(a) != len(b) or not np.allclose(a, b, rtol=1e-9, atol=0) for a, b in zip(edges, self.edges)
+        ):
+            raise ValueError(f'Binning of {self.name} in {filepath} is not compatible with the other files.')
+
+        self.values += values
+        self.sumw2 += sumw2
+        self.underflow += pkg['geometry']['underflow']
+        self.overflow += pkg['geometry']['overflow']
+        self.entries += pkg['geometry']['entries']
+        self.nfiles += 1
+
+    def package(self, filepaths: List[str]) -> ObjPackage:
+        errors = np.sqrt(self.sumw2)
+        geo = geometry.describe(self.values, self.edges)
+        # Per file totals of the flow-inclusive contents add up to the total of
+        # the sum. Per axis flow can not be added to the integral instead, as
+        # the axes share the corner bins of 2D and 3D histograms.
+        geo.update(underflow=self.underflow.tolist(), overflow=self.overflow.tolist(), entries=self.entries)
+        return ObjPackage(
+            name = f'{self.name} (sum of {self.nfiles} files)',
+            type = self.type,
+            data = (self.values, *self.edges),
+            errors = {'y': (errors, errors)},
+            geometry = geo,
+            source = {'merged': filepaths, 'name': self.name},
+            **self.titles
+        )
+
+def merge_histograms(filepaths: List[str], paths: List[str], max_workers: int = None,
+                     progress: Callable[[int, int], None] = None) -> Dict[str, ObjPackage]:
+    '''Sum histograms across files, like `hadd` does.
+
+    Args:
+        filepaths (List[str]): Files to merge.
+        paths (List[str]): Histogram names and/or directories (all histograms in them) to merge.
+        max_workers (int, optional): Number of files read at once. Defaults to `data.scan_workers`.
+            At most this many files' histograms are held besides the accumulators.
+        progress (Callable[[int, int], None], optional): Called with the number of files
+            merged so far and the total after each file.
+
+    Raises:
+        ValueError: If a histogram is binned differently in different files.
+
+    Returns:
+        Dict[str, ObjPackage]: Merged histogram per name (histograms missing from
+            some files are the sum over the files that have them).
+    '''
+    max_workers = max_workers or data.scan_workers
+    accumulators = {}
+    done = 0
+
+    def accumulate(filepath, histograms):
+        for name, (pkg, sumw2) in histograms.items():
+            if name in accumulators:
+                accumulators[name].add(pkg, sumw2, filepath)
+            else:
+                accumulators[name] = Accumulator(pkg, sumw2)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # Only `max_workers` files in flight so memory stays bounded
+        pending = {}
+        for filepath in filepaths:
+            pending[executor.submit(_read_file, filepath, paths)] = filepath
+            if len(pending) < max_workers:
+                continue
+
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                accumulate(pending.pop(future), future.result())
+                done += 1
+                if progress is not None:
+                    progress(done, len(filepaths))
+
+        for future in list(pending):
+            accumulate(pending.pop(future), future.result())
+            done += 1
+            if progress is not None:
+                progress(done, len(filepaths))
+
+    logging.debug(f'Merged {len(accumulators)} histograms from {len(filepaths)} files.')
+    return {name: acc.package(filepaths) for name, acc in accumulators.items()}
+
+def merged_histogram(filepaths: List[str], name: str, progress: Callable[[int, int], None] = None,
+                     compute: bool = True) -> ObjPackage:
+    '''One histogram summed across files (see `merge_histograms`), cached
+    (in memory and on disk) until any of the files change. With
+    `compute=False`, only a cached sum is returned (None if there is none).'''
+    cache_key = ('merged', name, tuple((f, file_stamp(f)) for f in filepaths[1:]))
+    pkg = obj_cache.get(filepaths[0], cache_key)
+    if pkg is None and compute:
+        merged = merge_histograms(filepaths, [name], progress=progress)
+        if name not in merged:
+            raise KeyError(f'No histogram {name} to sum in {len(filepaths)} files (profiles and efficiencies can not be summed).')
+        pkg = obj_cache.put(filepaths[0], cache_key, merged[name], persist=True)
+    return pkg
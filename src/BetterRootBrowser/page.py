@@ -41,7 +41,8 @@ file_path_input = html.Div([
                 ), 
             ], className='d-flex mb-1'
         ),
-        html.P('', id='file-open-msg', className='ms-2 mb-0')
+        html.P('', id='file-open-msg', className='ms-2 mb-0'),
+        dbc.Progress(id='file-scan-progress', value=0, max=1, class_name='mt-1', style={'visibility': 'hidden'})
     ], id='file-path-div'
 )
 
@@ -51,10 +52,16 @@ file_path_input = html.Div([
 #-----------#
 # Left pane #
 #-----------#
-file_accordion = lambda file_accordion_items: dbc.Accordion(
+file_accordion = lambda file_accordion_items, igroup=None: dbc.Accordion(
     children=sorted(file_accordion_items, key=lambda item: item.title),
     start_collapsed=True, flush=True,
-    id='file-list'
+    id='file-list' if igroup is None else f'group-{igroup}-file-list'
+)
+
+group_accordion_item = lambda file_accordion, group_name, nfiles, igroup: dbc.AccordionItem(
+    children=file_accordion,
+    title=f'{group_name} ({nfiles} files)',
+    item_id=f'group-{igroup}'
 )
 
 file_accordion_item = lambda type_accordion, file_name, ifile: dbc.AccordionItem(
@@ -91,6 +98,29 @@ obj_radio_template = lambda index, opts: dbc.RadioItems(
     value=None
 )
 
+# For files with too many objects to list: a search box, one page of the
+# matching objects (still an obj-radio) and a pager, filled by search_objects
+obj_search_panel = lambda ifile, filepath, nobjs, modes: html.Div([
+    dbc.InputGroup([
+        dbc.Input(
+            id={'id': f'file-{ifile}-type-search-radio', 'type': 'obj-search'},
+            type='search', value='', placeholder=f'Search {nobjs} objects...'
+        ),
+        dbc.Select(
+            id={'id': f'file-{ifile}-type-search-radio', 'type': 'obj-search-mode'},
+            options=[{'label': mode, 'value': mode} for mode in modes],
+            value='substring', style={'max-width': '8em'}
+        ),
+    ], size='sm'),
+    html.Small('', id={'id': f'file-{ifile}-type-search-radio', 'type': 'obj-search-msg'}, className='text-muted ms-1'),
+    obj_radio_template(f'file-{ifile}-type-search-radio', []),
+    dbc.Pagination(
+        id={'id': f'file-{ifile}-type-search-radio', 'type': 'obj-search-page'},
+        max_value=1, active_page=1, fully_expanded=False, size='sm', class_name='mt-1 mb-0'
+    ),
+    dcc.Store(id={'id': f'file-{ifile}-type-search-radio', 'type': 'obj-search-file'}, data=filepath)
+], className='p-1')
+
 file_info_pane = dcc.Loading(
     html.Div(
         file_accordion([]),
@@ -121,13 +151,22 @@ display_area = dcc.Loading(
 )
     
 
+# Shown while an object that is not cached yet is read (see callbacks.load_obj)
+obj_placeholder = lambda obj_name: [
+    html.H5(obj_name),
+    html.P(f'Reading {obj_name}...', className='text-muted'),
+    dbc.Progress(value=100, striped=True, animated=True, class_name='w-50')
+]
+
 #-----------#
 # Content body #
 #-----------#
 content_body = html.Div(
     [
         file_info_pane,
-        display_area
+        display_area,
+        # Object picked in the file browser that is not cached yet, read by a job
+        dcc.Store(id='obj-request')
     ],
     className='d-flex border-top mt-1 pb-2',
     id='content-body',
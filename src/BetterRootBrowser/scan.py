@@ -0,0 +1,312 @@
+import os, multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Tuple
+import numpy as np
+from numpy.typing import NDArray
+import awkward as ak
+import uproot
+from BetterRootBrowser.cache import file_pool
+from BetterRootBrowser.cuts import Cut
+
+import logging
+
+# Size of the entry ranges a tree is scanned in (entries or a memory size like "100 MB").
+# Can be set with BRB_STEP_SIZE.
+step_size = os.environ.get('BRB_STEP_SIZE', '100 MB')
+if step_size.isdigit():
+    step_size = int(step_size)
+
+# Number of processes a scan is split across. Every background job (a process
+# of its own) starts its own pool, so this is per job and capped to 4 by
+# default. Can be set with BRB_SCAN_PROCESSES.
+processes = int(os.environ.get('BRB_SCAN_PROCESSES', min(4, os.cpu_count() or 1)))
+# Threads each process uses for decompression and interpretation of baskets.
+# Can be set with BRB_DECOMPRESSION_THREADS.
+decompression_threads = int(os.environ.get('BRB_DECOMPRESSION_THREADS', 1))
+
+_pool = None
+_executor = None
+
+def get_pool(max_workers: int = processes) -> ProcessPoolExecutor:
+    '''Process pool shared by all scans of this process, started on first use
+    with at most `max_workers` (and `processes`) processes. Processes are
+    spawned (not forked) since the Dash server is multi-threaded.'''
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=max(1, min(processes, max_workers)),
+                                    mp_context=multiprocessing.get_context('spawn'))
+    return _pool
+
+def shutdown_pool() -> None:
+    '''Stop the pool, dropping the tasks that have not started yet.'''
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+def _results_in_order(tasks: List[Tuple], window: int):
+    # At most `window` tasks are submitted ahead of the one being consumed,
+    # so aborting (an exception in the consumer) leaves little work queued
+    pool = get_pool(len(tasks))
+    pending = deque()
+    itasks = iter(tasks)
+    try:
+        for task in itasks:
+            pending.append(pool.submit(_process_range, task))
+            if len(pending) >= window:
+                break
+        while pending:
+            result = pending.popleft().result()
+            for task in itasks:
+                pending.append(pool.submit(_process_range, task))
+                break
+            yield result
+    except BaseException:
+        for future in pending:
+            future.cancel()
+        shutdown_pool()
+        raise
+
+def get_executor() -> uproot.source.futures.Executor:
+    '''uproot decompression/interpretation executor of this process.'''
+    global _executor
+    if _executor is None:
+        if decompression_threads > 1:
+            _executor = uproot.ThreadPoolExecutor(max_workers=decompression_threads)
+        else:
+            _executor = uproot.TrivialExecutor()
+    return _executor
+
+def entry_ranges(filepaths: List[str], tree_name: str, branches: List[str], step_size: object = step_size) -> List[Tuple[str, int, int, int]]:
+    '''Split the tree `tree_name` in each file (a chain if there are several)
+    into ranges of entries holding about `step_size` (number of entries or
+    memory size) of `branches`.
+
+    Returns:
+        List[Tuple[str, int, int, int]]: File path, first and stop entry in that file
+            and entry number of the first entry of the file in the chain.
+    '''
+    ranges = []
+    file_offset = 0
+    for filepath in filepaths:
+        with file_pool.open(filepath) as file:
+            tree = file[tree_name]
+            step = step_size
+            if isinstance(step_size, str):
+                step = tree.num_entries_for(step_size, filter_name=lambda name: name in branches)
+            step = max(1, int(step))
+
+            for entry_start in range(0, tree.num_entries, step):
+                ranges.append((filepath, entry_start, min(entry_start+step, tree.num_entries), file_offset))
+            file_offset += tree.num_entries
+    return ranges
+
+def read_range(filepath: str, tree_name: str, branches: List[str], entry_start: int, entry_stop: int) -> Dict[str, ak.Array]:
+    with file_pool.open(filepath) as file:
+        return file[tree_name].arrays(
+            filter_name=lambda name: name in branches,
+            entry_start=entry_start, entry_stop=entry_stop,
+            decompression_executor=get_executor(), interpretation_executor=get_executor(),
+            library='ak', how=dict
+        )
+
+def _process_range(task: Tuple) -> object:
+    # Runs in the worker processes so everything in `task` must be picklable
+    func, args, tree_name, branches, (filepath, entry_start, entry_stop, file_offset) = task
+    chunk = read_range(filepath, tree_name, branches, entry_start, entry_stop)
+    return func(file_offset+entry_start, chunk, *args)
+
+def run(func: Callable, merge: Callable, filepaths: List[str], tree_name: str, branches: List[str],
+        args: Tuple = (), step_size: object = step_size, progress: Callable[[int, int], None] = None) -> object:
+    '''Scan a tree (or chain) range by range, in parallel across `processes`,
+    and merge the partial results in entry order.
+
+    Args:
+        func (Callable): Called as `func(entry_start, chunk, *args)` on each range, where
+            `entry_start` is the chain entry number of the first entry of the chunk
+            (a dict of branch name to awkward array). Must be a module level function.
+        merge (Callable): Combines two partial results (in entry order) into one.
+        filepaths (List[str]): Files holding the tree.
+        tree_name (str): Name of the tree in each file.
+        branches (List[str]): Branches to read.
+        args (Tuple, optional): Extra (picklable) arguments to `func`.
+        step_size (object, optional): Number of entries or memory size per range.
+        progress (Callable[[int, int], None], optional): Called with the number of entries
+            read so far and the total after each range. May raise to abort the scan,
+            which cancels the ranges not started yet.
+
+    Returns:
+        object: Merged result, None if the tree is empty.
+    '''
+    ranges = entry_ranges(filepaths, tree_name, branches, step_size)
+    tasks = [(func, args, tree_name, branches, r) for r in ranges]
+
+    if processes > 1 and len(tasks) > 1:
+        results = _results_in_order(tasks, window=2*processes)
+    else:
+        results = map(_process_range, tasks)
+
+    total = sum(entry_stop-entry_start for _, entry_start, entry_stop, _ in ranges)
+    done = 0
+    if progress is not None:
+        progress(done, total)
+
+    out = None
+    for (_, entry_start, entry_stop, _), result in zip(ranges, results):
+        out = result if out is None else merge(out, result)
+        done += entry_stop-entry_start
+        if progress is not None:
+            progress(done, total)
+    return out
+
+def selected(chunk: Dict[str, ak.Array], branch: str, cut: Cut = None) -> NDArray:
+    '''Finite values of `branch` in entries of the chunk passing `cut`.'''
+    array = chunk[branch]
+    if cut is not None:
+        array = array[cut(chunk)]
+    return flat_values(array)
+
+def flat_values(array: ak.Array) -> NDArray:
+    '''All finite values of a (possibly jagged) branch chunk as a flat numpy array.'''
+    values = ak.to_numpy(ak.flatten(array, axis=None))
+    return values[np.isfinite(values)]
+
+def read_branches(branch: str, cut: Cut = None) -> List[str]:
+    return sorted({branch} | set([] if cut is None else cut.branches))
+
+def _min_max(entry_start: int, chunk: Dict[str, ak.Array], branch: str, cut: Cut) -> Tuple[float, float]:
+    values = selected(chunk, branch, cut)
+    if values.size == 0:
+        return np.inf, -np.inf
+    return values.min(), values.max()
+
+def _merge_min_max(a: Tuple[float, float], b: Tuple[float, float]) -> Tuple[float, float]:
+    return min(a[0], b[0]), max(a[1], b[1])
+
+def branch_range(filepaths: List[str], tree_name: str, branch: str, cut: Cut = None,
+                 progress: Callable[[int, int], None] = None) -> Tuple[float, float]:
+    '''Minimum and maximum (finite) value of a branch, scanned range by range.'''
+    lo, hi = run(
+        _min_max, _merge_min_max, filepaths, tree_name, read_branches(branch, cut), (branch, cut), progress=progress
+    ) or (np.inf, -np.inf)
+
+    if lo > hi:
+        return 0., 1.
+    elif lo == hi:
+        return lo-0.5, hi+0.5
+    return float(lo), float(hi)
+
+def _fill(entry_start: int, chunk: Dict[str, ak.Array], branch: str, edges: NDArray, cut: Cut) -> NDArray:
+    return np.histogram(selected(chunk, branch, cut), bins=edges)[0].astype(np.float64)
+
+def histogram(filepaths: List[str], tree_name: str, branch: str, bins: int = 50,
+              range: Tuple[float, float] = None, cut: Cut = None,
+              progress: Callable[[int, int], None] = None) -> Tuple[NDArray, NDArray]:
+    '''Histogram of a branch, filled range by range (in parallel) and summed.
+    Every value of jagged branches is filled. If `range` is not given, it is
+    found with an extra scan (see `branch_range`). Only entries passing `cut`
+    are filled.
+
+    Returns:
+        Tuple[NDArray, NDArray]: Counts and bin edges, like `np.histogram`.
+    '''
+    if range is None:
+        range = branch_range(filepaths, tree_name, branch, cut, progress)
+
+    edges = np.linspace(range[0], range[1], bins+1)
+    counts = run(_fill, np.add, filepaths, tree_name, read_branches(branch, cut), (branch, edges, cut), progress=progress)
+    if counts is None:
+        counts = np.zeros(bins)
+
+    logging.debug(f'Filled {counts.sum()} values of {tree_name}/{branch} into {bins} bins.')
+    return counts, edges
+
+def _passing(entry_start: int, chunk: Dict[str, ak.Array], cut: Cut) -> NDArray:
+    return entry_start + np.flatnonzero(cut(chunk))
+
+def _concatenate(a: NDArray, b: NDArray) -> NDArray:
+    return np.concatenate([a, b])
+
+def select_entries(filepaths: List[str], tree_name: str, cut: Cut, default_branch: str,
+                   progress: Callable[[int, int], None] = None) -> NDArray:
+    '''Entry numbers (counted across the chain) of the entries passing `cut`,
+    evaluated range by range (in parallel) on only the branches the cut needs.
+    `default_branch` is read to count entries if the cut does not use any branch.'''
+    passing = run(_passing, _concatenate, filepaths, tree_name, cut.branches or [default_branch], (cut,), progress=progress)
+    return np.empty(0, dtype=np.int64) if passing is None else passing
+
+def branch_stats(array: ak.Array) -> Dict[str, object]:
+    '''Mergeable summary of one chunk of a (possibly jagged) numeric branch.
+    Mean and spread are kept as the count, mean and sum of squared deviations
+    of the finite values so partial summaries can be combined exactly (see
+    `merge_branch_stats`). None if the branch is not numeric.'''
+    values = ak.to_numpy(ak.flatten(array, axis=None))
+    if values.dtype.kind not in 'biuf':
+        return None
+
+    finite = values[np.isfinite(values)] if values.dtype.kind == 'f' else values
+    n = finite.size
+    mean = finite.mean(dtype=np.float64) if n else 0.
+    stats = dict(
+        entries = len(array),
+        values = values.size,
+        n = n,
+        mean = float(mean),
+        m2 = float(np.sum((finite - mean)**2, dtype=np.float64)) if n else 0.,
+        min = float(finite.min()) if n else np.inf,
+        max = float(finite.max()) if n else -np.inf,
+        nan = int(np.isnan(values).sum()) if values.dtype.kind == 'f' else 0,
+        inf = int(np.isinf(values).sum()) if values.dtype.kind == 'f' else 0,
+        multiplicity = None,
+    )
+    if array.ndim > 1:
+        stats['multiplicity'] = np.bincount(ak.to_numpy(ak.num(array, axis=1)))
+    return stats
+
+def merge_branch_stats(a: Dict[str, object], b: Dict[str, object]) -> Dict[str, object]:
+    '''Combine two summaries of the same branch (Chan et al. parallel variance).'''
+    if a is None or b is None:
+        return a if b is None else b
+
+    n = a['n'] + b['n']
+    delta = b['mean'] - a['mean']
+    out = dict(
+        entries = a['entries'] + b['entries'],
+        values = a['values'] + b['values'],
+        n = n,
+        mean = a['mean'] + delta*b['n']/n if n else 0.,
+        m2 = a['m2'] + b['m2'] + delta**2*a['n']*b['n']/n if n else 0.,
+        min = min(a['min'], b['min']),
+        max = max(a['max'], b['max']),
+        nan = a['nan'] + b['nan'],
+        inf = a['inf'] + b['inf'],
+        multiplicity = None,
+    )
+    if a['multiplicity'] is not None:
+        size = max(a['multiplicity'].size, b['multiplicity'].size)
+        out['multiplicity'] = (
+            np.pad(a['multiplicity'], (0, size-a['multiplicity'].size)) +
+            np.pad(b['multiplicity'], (0, size-b['multiplicity'].size))
+        )
+    return out
+
+def _stats(entry_start: int, chunk: Dict[str, ak.Array]) -> Dict[str, Dict[str, object]]:
+    return {branch: branch_stats(array) for branch, array in chunk.items()}
+
+def _merge_stats(a: Dict[str, Dict[str, object]], b: Dict[str, Dict[str, object]]) -> Dict[str, Dict[str, object]]:
+    return {branch: merge_branch_stats(a[branch], b[branch]) for branch in a}
+
+def summarize(filepaths: List[str], tree_name: str, branches: List[str],
+              progress: Callable[[int, int], None] = None) -> Dict[str, Dict[str, object]]:
+    '''Statistics of every branch in `branches` (see `branch_stats`), computed
+    in a single pass over the tree, range by range (in parallel). Only one
+    range of the branches is held in memory per process at a time.
+
+    Returns:
+        Dict[str, Dict[str, object]]: Branch name to its merged summary
+            (None for non numeric branches).
+    '''
+    stats = run(_stats, _merge_stats, filepaths, tree_name, branches, progress=progress) or {}
+    logging.debug(f'Summarized {len(stats)} branches of {tree_name}.')
+    return stats
@@ -0,0 +1,108 @@
+'''Server-side index of the object names of a file, for files with too many
+objects to list them all in the browser. Names are kept sorted (ignoring
+case) in numpy arrays so a prefix search is a binary search and a substring
+search is one vectorized pass. Regular expressions are matched name by name.
+Results are indices into the sorted names, so paging through them is a slice.
+'''
+import os, re, sys
+from typing import List, Tuple
+import numpy as np
+from numpy.typing import NDArray
+from BetterRootBrowser import data
+from BetterRootBrowser.cache import obj_cache
+
+import logging
+
+modes = ['prefix', 'substring', 'regex']
+
+# Files with more supported objects than this get a search box instead of
+# the full list of objects. Can be set with BRB_MAX_LISTED_OBJECTS.
+max_listed_objects = int(os.environ.get('BRB_MAX_LISTED_OBJECTS', 500))
+
+# Number of search results per page. Can be set with BRB_SEARCH_PAGE_SIZE.
+page_size = int(os.environ.get('BRB_SEARCH_PAGE_SIZE', 50))
+
+class ObjIndex():
+    '''Searchable object names (and types) of one file.'''
+    def __init__(self, names: List[str], types: List[str]) -> None:
+        lower = np.array([name.lower() for name in names], dtype=str)
+        order = np.argsort(lower, kind='stable')
+        self.names = np.array(names, dtype=object)[order]
+        self.types = np.array(types, dtype=object)[order]
+        self._lower = lower[order]
+        self._last = None
+
+    def search(self, query: str, mode: str = 'substring') -> NDArray:
+        '''Indices (into `names`) of the names matching `query`, ignoring case.
+
+        Args:
+            query (str): Text to look for. Empty matches everything.
+            mode (str, optional): One of `modes`. Defaults to 'substring'.
+
+        Raises:
+            re.error: If `query` is not a valid regular expression in 'regex' mode.
+
+        Returns:
+            NDArray: Matching indices, in name order.
+        '''
+        if self._last is not None and self._last[:2] == (query, mode):
+            return self._last[2]
+
+        if not query:
+            found = np.arange(len(self.names))
+        elif mode == 'prefix':
+            lower = query.lower()
+            upper = lower[:-1] + chr(ord(lower[-1])+1)
+            found = np.arange(*np.searchsorted(self._lower, [lower, upper]))
+        elif mode == 'substring':
+            # Typing more of a query can only narrow down the previous matches
+            candidates = np.arange(len(self.names))
+            if self._last is not None and self._last[1] == mode and self._last[0].lower() in query.lower():
+                candidates = self._last[2]
+            found = candidates[np.char.find(self._lower[candidates], query.lower()) >= 0]
+        elif mode == 'regex':
+            pattern = re.compile(query, re.IGNORECASE)
+            found = np.nonzero(np.fromiter((pattern.search(name) is not None for name in self.names),
+                                           dtype=bool, count=len(self.names)))[0]
+        else:
+            raise ValueError(f'Unknown search mode {mode}, choose from {modes}.')
+
+        self._last = (query, mode, found)
+        return found
+
+    def page(self, query: str, mode: str = 'substring', page: int = 1,
+             size: int = None) -> Tuple[List[str], List[str], int]:
+        '''One page of the results of `search`.
+
+        Args:
+            page (int, optional): Page number, from 1. Defaults to 1.
+            size (int, optional): Results per page. Defaults to `page_size`.
+
+        Returns:
+            Tuple[List[str], List[str], int]: Names and types on the page, and the total number of matches.
+        '''
+        size = size or page_size
+        found = self.search(query, mode)
+        on_page = found[(page-1)*size:page*size]
+        return self.names[on_page].tolist(), self.types[on_page].tolist(), len(found)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __sizeof__(self) -> int:
+        # So that the object cache accounts for the arrays
+        return object.__sizeof__(self) + self._lower.nbytes + sum(sys.getsizeof(n) for n in self.names) + self.types.nbytes
+
+    def __repr__(self) -> str:
+        return f'ObjIndex({len(self)} objects)'
+
+def obj_index(filepath: str) -> ObjIndex:
+    '''`ObjIndex` of the supported objects of a file (from its catalog, see
+    `data.get_file_info`), built once and cached until the file changes.'''
+    index = obj_cache.get(filepath, ('obj_index',))
+    if index is None:
+        info = data.get_file_info(filepath)
+        index = ObjIndex(list(info), [obj['type'] for obj in info.values()])
+        logging.debug(f'Indexed {len(index)} objects of {filepath}')
+        index = obj_cache.put(filepath, ('obj_index',), index)
+    return index
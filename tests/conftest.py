@@ -0,0 +1,5 @@
+import os, sys, tempfile
+
+# Run against the source tree, with caches kept out of the user's cache directory
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+os.environ.setdefault('BRB_CACHE_DIR', tempfile.mkdtemp(prefix='brb-tests-'))
@@ -0,0 +1,60 @@
+import pickle
+import numpy as np
+import awkward as ak
+import pytest
+from BetterRootBrowser.cuts import Cut
+
+@pytest.fixture
+def chunk():
+    rng = np.random.default_rng(1)
+    njet = rng.poisson(2, 1000)
+    return {
+        'nJet': ak.Array(njet),
+        'pt': ak.Array(rng.exponential(50, 1000)),
+        'passed': ak.Array(rng.random(1000) > 0.5),
+        'Jet_pt': ak.unflatten(rng.exponential(50, njet.sum()), njet),
+    }
+
+def select(expression, chunk):
+    return Cut(expression, list(chunk))(chunk)
+
+def test_int_operands_are_truthy(chunk):
+    njet, pt = chunk['nJet'].to_numpy(), chunk['pt'].to_numpy()
+    np.testing.assert_array_equal(select('nJet && pt > 50', chunk), (njet != 0) & (pt > 50))
+    np.testing.assert_array_equal(select('nJet || pt > 50', chunk), (njet != 0) | (pt > 50))
+    np.testing.assert_array_equal(select('!nJet', chunk), njet == 0)
+    np.testing.assert_array_equal(select('!(nJet > 1)', chunk), ~(njet > 1))
+
+def test_bool_branch(chunk):
+    passed, njet = chunk['passed'].to_numpy(), chunk['nJet'].to_numpy()
+    np.testing.assert_array_equal(select('passed', chunk), passed)
+    np.testing.assert_array_equal(select('!passed && nJet >= 2', chunk), ~passed & (njet >= 2))
+    np.testing.assert_array_equal(select('passed == true', chunk), passed)
+
+def test_chained_comparison(chunk):
+    pt = chunk['pt'].to_numpy()
+    np.testing.assert_array_equal(select('20 < pt < 80', chunk), (pt > 20) & (pt < 80))
+
+def test_jagged_branch(chunk):
+    jet_pt = chunk['Jet_pt']
+    leading = ak.fill_none(ak.firsts(jet_pt), np.nan).to_numpy()
+    np.testing.assert_array_equal(select('Jet_pt[0] > 100', chunk), leading > 100)
+    np.testing.assert_array_equal(select('Jet_pt > 100', chunk), ak.to_numpy(ak.any(jet_pt > 100, axis=1)))
+    np.testing.assert_array_equal(
+        select('nJet && Jet_pt[1] > 30', chunk),
+        (chunk['nJet'].to_numpy() != 0) & (ak.fill_none(ak.pad_none(jet_pt, 2)[:, 1], np.nan).to_numpy() > 30)
+    )
+
+def test_used_branches_and_pickle(chunk):
+    cut = Cut('nJet > 1 && abs(pt) < 50', list(chunk))
+    assert cut.branches == ['nJet', 'pt']
+    np.testing.assert_array_equal(pickle.loads(pickle.dumps(cut))(chunk), cut(chunk))
+
+@pytest.mark.parametrize('expression, error', [
+    ('foo > 1', NameError),
+    ('Jet_pt[nJet] > 1', SyntaxError),
+    ('__import__("os")', SyntaxError),
+])
+def test_invalid(chunk, expression, error):
+    with pytest.raises(error):
+        Cut(expression, list(chunk))
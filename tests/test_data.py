@@ -0,0 +1,55 @@
+import pickle
+import numpy as np
+import pandas as pd
+import awkward as ak
+import uproot
+from BetterRootBrowser.data import ObjPackage, get_file_info, read_graph, set_n_subentries, ChainTree
+from BetterRootBrowser.cache import ObjCache
+
+def test_objpackage_pickle_roundtrip():
+    pkg = ObjPackage(name='h', type='TH1D', data=(np.arange(3.), np.linspace(0, 1, 4)))
+    out = pickle.loads(pickle.dumps(pkg))
+    assert isinstance(out, ObjPackage)
+    assert out['name'] == 'h' and out['type'] == 'TH1D'
+    np.testing.assert_array_equal(out['data'][0], pkg['data'][0])
+
+def test_objpackage_from_disk_cache_in_new_process(tmp_path):
+    # A fresh ObjCache on the same directory stands in for another process
+    filepath = tmp_path / 'f.root'
+    filepath.write_bytes(b'x')
+    ObjCache(2**20, disk_dir=str(tmp_path / 'cache')).put(str(filepath), ('k',), ObjPackage(name='h'), persist=True)
+    out = ObjCache(2**20, disk_dir=str(tmp_path / 'cache')).get(str(filepath), ('k',))
+    assert isinstance(out, ObjPackage) and out['name'] == 'h'
+
+def test_template_metadata_is_not_copied(tmp_path):
+    # Same keys, different branches and binning: nothing of the template's
+    # metadata may end up in the other file's catalog
+    paths = [str(tmp_path / 'a.root'), str(tmp_path / 'b.root')]
+    for path, (branch, bins) in zip(paths, [('x', 10), ('y', 20)]):
+        with uproot.recreate(path) as f:
+            f.mktree('Events', {branch: np.int64}).extend({branch: np.arange(5)})
+            f['h'] = (np.zeros(bins), np.linspace(0, 1, bins+1))
+    template = get_file_info(paths[0])
+    info = get_file_info(paths[1], template)
+    assert info['h'] == {'name': 'h', 'type': template['h']['type'], 'cycle': template['h']['cycle']}
+    assert 'branches' not in info['Events'] and 'dims' not in info['h']
+    assert get_file_info(paths[1]) == info
+    assert ChainTree(paths, 'Events').branches == []
+    assert ChainTree(paths[1:], 'Events').branches == ['y']
+
+def test_graph_axis_titles(tmp_path):
+    path = str(tmp_path / 'g.root')
+    points = pd.DataFrame({'x': [1., 2.], 'y': [3., 4.]})
+    with uproot.recreate(path) as f:
+        f['labelled'] = uproot.as_TGraph(points, title='t', xAxisLabel='p_{T}', yAxisLabel='Events')
+        f['plain'] = uproot.as_TGraph(points, title='t')
+    with uproot.open(path) as f:
+        labelled, plain = read_graph(f['labelled']), read_graph(f['plain'])
+    assert (labelled['xtitle'], labelled['ytitle']) == ('p_{T}', 'Events')
+    assert (plain['xtitle'], plain['ytitle']) == ('', '')
+
+def test_vector_of_vector_cells():
+    array = ak.Array([[[1., 2.], [3.]], [], [[4.]]*7])
+    out = set_n_subentries(array, 3)
+    assert out.shape == (3, 3)
+    assert out.tolist() == [[[1., 2.], [3.], 0], [0, 0, 0], [[4.]]*3]
@@ -0,0 +1,26 @@
+from BetterRootBrowser import matcher
+
+def test_groups_by_year():
+    names = [f'THselection_{sample}_{year}.root' for sample in ('QCD', 'TTbar', 'QCDHT1000') for year in (16, 17, 18)]
+    assert matcher.group(names) == {
+        f'THselection_{sample}_*.root': [f'THselection_{sample}_{year}.root' for year in (16, 17, 18)]
+        for sample in ('QCD', 'TTbar', 'QCDHT1000')
+    }
+
+def test_single_names_are_their_own_label():
+    assert matcher.group(['a.root']) == {'a.root': ['a.root']}
+    assert matcher.group([]) == {}
+
+def test_no_groups_across_directories():
+    paths = ['/data/a/x_16.root', '/data/a/x_17.root', '/data/b/y.root']
+    assert matcher.group(paths) == {
+        '/data/a/x_*.root': ['/data/a/x_16.root', '/data/a/x_17.root'],
+        '/data/b/y.root': ['/data/b/y.root'],
+    }
+
+def test_same_names_in_different_directories():
+    paths = ['/data/a/x_16.root', '/data/b/x_16.root', '/data/a/x_17.root', '/data/b/x_17.root']
+    assert matcher.group(paths) == {
+        '/data/a/x_*.root': ['/data/a/x_16.root', '/data/a/x_17.root'],
+        '/data/b/x_*.root': ['/data/b/x_16.root', '/data/b/x_17.root'],
+    }
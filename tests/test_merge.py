@@ -0,0 +1,58 @@
+import pickle
+import numpy as np
+import uproot
+import pytest
+from BetterRootBrowser import merge
+from BetterRootBrowser.cache import obj_cache
+
+@pytest.fixture
+def files(tmp_path):
+    rng = np.random.default_rng(2)
+    paths, counts = [], []
+    edges = np.linspace(0, 1, 11)
+    for i in range(3):
+        values, _ = np.histogram(rng.random(100), bins=edges)
+        path = str(tmp_path / f'f_{i}.root')
+        with uproot.recreate(path) as f:
+            f['h'] = (values.astype(np.float64), edges)
+        paths.append(path)
+        counts.append(values)
+    return paths, np.sum(counts, axis=0)
+
+def test_merge_sums_without_filling_the_object_cache(files):
+    paths, expected = files
+    obj_cache.clear()
+    merged = merge.merge_histograms(paths, ['h'])
+    np.testing.assert_allclose(merged['h']['data'][0], expected)
+    np.testing.assert_allclose(merged['h']['errors']['y'][0], np.sqrt(expected))
+    assert not any(key == 'h' for (_, key) in obj_cache._entries)
+
+def test_merged_histogram_pickles(files):
+    paths, expected = files
+    pkg = pickle.loads(pickle.dumps(merge.merged_histogram(paths, 'h')))
+    np.testing.assert_allclose(pkg['data'][0], expected)
+    assert pkg['source'] == {'merged': paths, 'name': 'h'}
+
+def write_th2(path, flow_values):
+    # Contents include under/overflow: shape (nx+2, ny+2)
+    nx, ny = flow_values.shape[0]-2, flow_values.shape[1]-2
+    with uproot.recreate(path) as f:
+        f['h2'] = uproot.writing.identify.to_TH2x(
+            'h2', '', flow_values.T.ravel().astype(np.float64), float(flow_values.sum()),
+            float(flow_values.sum()), float(flow_values.sum()), 0., 0., 0., 0., 0.,
+            flow_values.T.ravel().astype(np.float64),
+            uproot.writing.identify.to_TAxis('xaxis', '', nx, 0., 1.),
+            uproot.writing.identify.to_TAxis('yaxis', '', ny, 0., 1.),
+        )
+
+def test_merged_entries_count_corner_bins_once(tmp_path):
+    flow_values = np.zeros((4, 5))
+    flow_values[1:-1, 1:-1] = 1.
+    flow_values[0, 0] = flow_values[-1, -1] = flow_values[0, -1] = 10.
+    paths = [str(tmp_path / f'f_{i}.root') for i in range(2)]
+    for path in paths:
+        write_th2(path, flow_values)
+
+    merged = merge.merge_histograms(paths, ['h2'])['h2']
+    np.testing.assert_allclose(merged['data'][0], 2*flow_values[1:-1, 1:-1])
+    assert merged['geometry']['entries'] == 2*flow_values.sum()
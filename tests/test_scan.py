@@ -0,0 +1,35 @@
+import numpy as np
+import uproot
+import pytest
+from BetterRootBrowser import scan
+from BetterRootBrowser.cuts import Cut
+
+@pytest.fixture
+def tree_file(tmp_path):
+    path = str(tmp_path / 'tree.root')
+    with uproot.recreate(path) as f:
+        f['Events'] = {'x': np.arange(1000, dtype=np.int64)}
+    return path
+
+@pytest.fixture
+def two_processes(monkeypatch):
+    monkeypatch.setattr(scan, 'processes', 2)
+    yield
+    scan.shutdown_pool()
+
+def test_parallel_scan_merges_in_order(tree_file, two_processes):
+    out = scan.run(scan._passing, scan._concatenate, [tree_file], 'Events', ['x'],
+                   args=(Cut('x >= 0', ['x']),), step_size=50)
+    np.testing.assert_array_equal(out, np.arange(1000))
+
+def test_abort_from_progress_cancels_pending_ranges(tree_file, two_processes):
+    class Abort(Exception):
+        pass
+    def progress(done, total):
+        if done >= 100:
+            raise Abort()
+
+    with pytest.raises(Abort):
+        scan.run(scan._passing, scan._concatenate, [tree_file], 'Events', ['x'],
+                 args=(Cut('x >= 0', ['x']),), step_size=50, progress=progress)
+    assert scan._pool is None